@@ -0,0 +1,256 @@
+#!/usr/bin/env python3
+"""Synthetic dataset generator for scale testing.
+
+Generates suppliers, vendors, products and orders that match the documents
+written by server.py, so analytics and pagination can be exercised locally at
+production-like volume:
+
+    python generate_data.py --suppliers 10000 --vendors 50000 \
+        --products 500000 --orders 5000000 --seed 42 --drop
+
+Every batch is generated from its own RNG derived from the seed, so the output
+is identical between runs no matter how the parallel batches interleave.
+"""
+import asyncio
+import os
+import random
+import time
+import uuid
+from datetime import datetime, timedelta
+from typing import Callable, List
+
+import typer
+from motor.motor_asyncio import AsyncIOMotorClient
+
+from server import SAMPLE_PRODUCTS, get_password_hash
+
+app = typer.Typer(add_completion=False, help="Generate synthetic StreetFood-Connect data.")
+
+ID_NAMESPACE = uuid.UUID("5f0c8a52-3c1e-4c43-9a57-1d3b8f3e7a10")
+
+FIRST_NAMES = [
+    "Aarav", "Vivaan", "Aditya", "Arjun", "Sai", "Rohan", "Ishaan", "Kabir", "Ananya", "Diya",
+    "Priya", "Kavya", "Meera", "Saanvi", "Lakshmi", "Farhan", "Imran", "Gurpreet", "Harpreet", "Joseph",
+]
+LAST_NAMES = [
+    "Sharma", "Verma", "Patel", "Reddy", "Iyer", "Nair", "Singh", "Gupta", "Khan", "Das",
+    "Mehta", "Joshi", "Kulkarni", "Banerjee", "Pillai", "Chopra", "Rao", "Yadav", "Shaikh", "Fernandes",
+]
+# City centres as (longitude, latitude); users are scattered around them
+CITIES = {
+    "Mumbai": (72.8777, 19.0760), "Delhi": (77.2090, 28.6139), "Bengaluru": (77.5946, 12.9716),
+    "Hyderabad": (78.4867, 17.3850), "Chennai": (80.2707, 13.0827), "Kolkata": (88.3639, 22.5726),
+    "Pune": (73.8567, 18.5204), "Ahmedabad": (72.5714, 23.0225), "Jaipur": (75.7873, 26.9124),
+    "Lucknow": (80.9462, 26.8467),
+}
+CITY_NAMES = sorted(CITIES)
+STREETS = ["Market Road", "Station Road", "MG Road", "Gandhi Nagar", "Main Bazaar", "Church Street", "Ring Road"]
+SUPPLIER_SUFFIXES = ["Traders", "Wholesale", "Agro Supplies", "Fresh Mart", "Distributors", "& Sons"]
+VENDOR_DISHES = ["Chaat", "Pav Bhaji", "Vada Pav", "Dosa", "Momos", "Chole Bhature", "Pani Puri", "Kathi Rolls"]
+
+# Orders mostly arrive during the morning restocking rush
+ORDER_HOUR_WEIGHTS = [1, 1, 1, 2, 6, 10, 12, 12, 10, 7, 5, 4, 3, 3, 3, 3, 2, 2, 2, 2, 1, 1, 1, 1]
+
+
+def entity_id(seed: int, kind: str, index: int) -> str:
+    """Stable id for the index-th entity of a kind, so orders can reference
+    users and products without keeping them in memory."""
+    return str(uuid.uuid5(ID_NAMESPACE, f"{seed}:{kind}:{index}"))
+
+
+def batch_rng(seed: int, kind: str, batch: int) -> random.Random:
+    return random.Random(f"{seed}:{kind}:{batch}")
+
+
+def make_user(seed: int, user_type: str, index: int, hashed_password: str, epoch: datetime) -> dict:
+    rng = random.Random(f"{seed}:{user_type}:{index}")
+    first, last = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+    city = rng.choice(CITY_NAMES)
+    lng, lat = CITIES[city]
+    if user_type == "supplier":
+        name = f"{last} {rng.choice(SUPPLIER_SUFFIXES)}"
+    else:
+        name = f"{first}'s {rng.choice(VENDOR_DISHES)}"
+    return {
+        "id": entity_id(seed, user_type, index),
+        "email": f"{user_type}{index}@example.com",
+        "name": name,
+        "phone": f"9{rng.randrange(10 ** 9):09d}",
+        "address": f"{rng.randint(1, 999)} {rng.choice(STREETS)}, {city}",
+        "user_type": user_type,
+        "location": {"type": "Point", "coordinates": [round(lng + rng.uniform(-0.15, 0.15), 6),
+                                                      round(lat + rng.uniform(-0.15, 0.15), 6)]},
+        "created_at": epoch - timedelta(days=rng.uniform(0, 365)),
+        "is_active": True,
+        "password": hashed_password,
+    }
+
+
+def make_product(seed: int, index: int, suppliers: int, epoch: datetime) -> dict:
+    rng = random.Random(f"{seed}:product:{index}")
+    template = SAMPLE_PRODUCTS[index % len(SAMPLE_PRODUCTS)]
+    created_at = epoch - timedelta(days=365 + rng.uniform(0, 30))
+    return {
+        **template,
+        "id": entity_id(seed, "product", index),
+        "supplier_id": entity_id(seed, "supplier", index % suppliers),
+        "price": round(template["price"] * rng.uniform(0.8, 1.25), 2),
+        "stock_quantity": int(template["stock_quantity"] * rng.uniform(0.5, 3)),
+        "created_at": created_at,
+        "updated_at": created_at + timedelta(days=rng.uniform(0, 365)),
+        "is_active": rng.random() > 0.02,
+    }
+
+
+def products_of_supplier(supplier: int, suppliers: int, products: int) -> int:
+    """Number of products owned by a supplier; product j belongs to supplier j % suppliers."""
+    if supplier >= products:
+        return 0
+    return (products - supplier - 1) // suppliers + 1
+
+
+def make_order(rng: random.Random, seed: int, vendors: int, suppliers: int, products: int,
+               days: int, epoch: datetime) -> dict:
+    supplier = rng.randrange(min(suppliers, products))
+    owned = products_of_supplier(supplier, suppliers, products)
+    line_count = min(owned, rng.choice([1, 1, 2, 2, 3, 3, 4, 5, 6, 8]))
+    slots = rng.sample(range(owned), line_count)
+
+    items = []
+    for slot in slots:
+        product = make_product(seed, supplier + slot * suppliers, suppliers, epoch)
+        quantity = product["min_order_quantity"] * rng.randint(1, 4)
+        items.append({
+            "product_id": product["id"],
+            "product_name": product["name"],
+            "quantity": quantity,
+            "price": product["price"],
+            "unit": product["unit"],
+            "total": round(product["price"] * quantity, 2),
+        })
+
+    day = rng.randrange(days)
+    hour = rng.choices(range(24), weights=ORDER_HOUR_WEIGHTS)[0]
+    created_at = (epoch - timedelta(days=days - day)).replace(hour=hour, minute=rng.randrange(60),
+                                                              second=rng.randrange(60), microsecond=0)
+    age_days = days - day
+    if age_days > 3:
+        status = "cancelled" if rng.random() < 0.05 else "delivered"
+    else:
+        status = rng.choice(["pending", "confirmed", "confirmed", "delivered"])
+
+    subtotal = round(sum(item["total"] for item in items), 2)
+    tax = round(subtotal * 0.18, 2)
+    vendor = rng.randrange(vendors)
+    return {
+        "id": str(uuid.UUID(int=rng.getrandbits(128), version=4)),
+        "vendor_id": entity_id(seed, "vendor", vendor),
+        "supplier_id": entity_id(seed, "supplier", supplier),
+        "items": items,
+        "subtotal": subtotal,
+        "tax": tax,
+        "total": round(subtotal + tax, 2),
+        "status": status,
+        "delivery_address": make_user(seed, "vendor", vendor, "", epoch)["address"],
+        "created_at": created_at,
+        "updated_at": created_at + timedelta(hours=rng.uniform(0, 48) if status != "pending" else 0),
+        "delivery_date": created_at + timedelta(days=1) if status == "delivered" else None,
+    }
+
+
+async def write_batches(collection, kind: str, total: int, batch_size: int, concurrency: int,
+                        build_batch: Callable[[int, int, int], List[dict]]):
+    """Insert `total` generated documents in parallel `insert_many` batches."""
+    if total <= 0:
+        return
+    semaphore = asyncio.Semaphore(concurrency)
+    written = 0
+    started = time.perf_counter()
+
+    async def run(batch: int):
+        nonlocal written
+        async with semaphore:
+            start = batch * batch_size
+            docs = build_batch(batch, start, min(start + batch_size, total))
+            await collection.insert_many(docs, ordered=False)
+            written += len(docs)
+            if batch % 20 == 0 or written == total:
+                rate = written / max(time.perf_counter() - started, 1e-9)
+                typer.echo(f"  {kind}: {written}/{total} ({rate:,.0f} docs/s)")
+
+    batches = (total + batch_size - 1) // batch_size
+    await asyncio.gather(*(run(batch) for batch in range(batches)))
+
+
+async def generate_dataset(mongo_url: str, db_name: str, suppliers: int, vendors: int, products: int,
+                           orders: int, days: int, seed: int, batch_size: int, concurrency: int,
+                           password: str, drop: bool, epoch: datetime):
+    client = AsyncIOMotorClient(mongo_url)
+    db = client[db_name]
+    hashed_password = get_password_hash(password)
+
+    try:
+        if drop:
+            typer.echo(f"Dropping users, products and orders in {db_name}")
+            for name in ("users", "products", "orders", "orders_archive", "vendor_order_summaries",
+                         "product_price_history"):
+                await db[name].drop()
+
+        typer.echo(f"Generating {suppliers} suppliers and {vendors} vendors")
+        await write_batches(
+            db.users, "suppliers", suppliers, batch_size, concurrency,
+            lambda batch, lo, hi: [make_user(seed, "supplier", i, hashed_password, epoch) for i in range(lo, hi)],
+        )
+        await write_batches(
+            db.users, "vendors", vendors, batch_size, concurrency,
+            lambda batch, lo, hi: [make_user(seed, "vendor", i, hashed_password, epoch) for i in range(lo, hi)],
+        )
+
+        typer.echo(f"Generating {products} products")
+        await write_batches(
+            db.products, "products", products, batch_size, concurrency,
+            lambda batch, lo, hi: [make_product(seed, i, suppliers, epoch) for i in range(lo, hi)],
+        )
+
+        if orders and not (suppliers and vendors and products):
+            raise typer.BadParameter("Orders need at least one supplier, vendor and product")
+        typer.echo(f"Generating {orders} orders over {days} days")
+
+        def order_batch(batch, lo, hi):
+            rng = batch_rng(seed, "orders", batch)
+            return [make_order(rng, seed, vendors, suppliers, products, days, epoch) for _ in range(lo, hi)]
+
+        await write_batches(db.orders, "orders", orders, batch_size, concurrency, order_batch)
+    finally:
+        client.close()
+
+
+@app.command()
+def generate(
+    suppliers: int = typer.Option(100, help="Number of supplier accounts."),
+    vendors: int = typer.Option(1000, help="Number of vendor accounts."),
+    products: int = typer.Option(5000, help="Number of products, spread evenly across suppliers."),
+    orders: int = typer.Option(50000, help="Number of orders."),
+    days: int = typer.Option(365, help="Orders are spread over this many days before --until."),
+    seed: int = typer.Option(42, help="Seed for deterministic output."),
+    batch_size: int = typer.Option(1000, help="Documents per insert_many call."),
+    concurrency: int = typer.Option(8, help="insert_many batches in flight at once."),
+    password: str = typer.Option("password123", help="Password shared by every generated account."),
+    until: datetime = typer.Option(None, formats=["%Y-%m-%d"],
+                                   help="End of the generated history, defaults to today. Pin it to reproduce a dataset."),
+    drop: bool = typer.Option(False, help="Drop users, products and orders before generating."),
+    mongo_url: str = typer.Option(None, envvar="MONGO_URL", help="Defaults to MONGO_URL from backend/.env."),
+    db_name: str = typer.Option(None, envvar="DB_NAME", help="Defaults to DB_NAME from backend/.env."),
+):
+    """Generate users, products and orders at the requested scale."""
+    epoch = (until or datetime.utcnow()).replace(hour=0, minute=0, second=0, microsecond=0)
+    started = time.perf_counter()
+    asyncio.run(generate_dataset(
+        mongo_url or os.environ["MONGO_URL"], db_name or os.environ["DB_NAME"], suppliers, vendors,
+        products, orders, days, seed, batch_size, concurrency, password, drop, epoch,
+    ))
+    typer.echo(f"Done in {time.perf_counter() - started:.1f}s")
+
+
+if __name__ == "__main__":
+    app()
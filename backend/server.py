@@ -1,30 +1,53 @@
-from fastapi import FastAPI, APIRouter, HTTPException, Depends, File, UploadFile, Form
+from fastapi import FastAPI, APIRouter, HTTPException, Depends, File, UploadFile, Form, Query, Header, Request
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from fastapi.responses import Response
+from fastapi.responses import JSONResponse, Response, StreamingResponse
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
-from motor.motor_asyncio import AsyncIOMotorClient
+from motor.motor_asyncio import AsyncIOMotorClient, AsyncIOMotorGridFSBucket
+import pymongo
+from pymongo import CursorType, ReturnDocument, UpdateOne
+from pymongo.read_preferences import Nearest, Primary, PrimaryPreferred, Secondary, SecondaryPreferred
+from pymongo.errors import BulkWriteError, CollectionInvalid, DuplicateKeyError, PyMongoError
+from bson import ObjectId
+from gridfs.errors import NoFile
 import os
+import asyncio
+import contextvars
 import logging
 from pathlib import Path
-from pydantic import BaseModel, Field, EmailStr
-from typing import List, Optional
+from pydantic import BaseModel, Field, EmailStr, field_validator
+from typing import Awaitable, Callable, Dict, List, Literal, Optional, Union
 import uuid
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
 from passlib.context import CryptContext
 from jose import JWTError, jwt
 import bcrypt
 import json
-from io import BytesIO
+import base64
+import csv
+import gzip
+import hashlib
+import re
+import tempfile
+from io import BytesIO, StringIO
 from reportlab.lib.pagesizes import letter, A4
 from reportlab.pdfgen import canvas
 from reportlab.lib.units import inch
-from reportlab.lib.styles import getSampleStyleSheet
+from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
 from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle
 from reportlab.lib.enums import TA_CENTER, TA_LEFT, TA_RIGHT
 from reportlab.lib.colors import black, blue, grey
 from reportlab.lib import colors
 
+try:
+    import msgpack
+except ImportError:  # MessagePack responses are only offered when msgpack is installed
+    msgpack = None
+try:
+    import brotli
+except ImportError:  # falls back to gzip
+    brotli = None
+
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
 
@@ -33,11 +56,85 @@ mongo_url = os.environ['MONGO_URL']
 client = AsyncIOMotorClient(mongo_url)
 db = client[os.environ['DB_NAME']]
 
+# Read routing: auth and order reads/writes always use `db` (primary). Catalog browsing and
+# analytics can be sent to secondaries, e.g. CATALOG_READ_PREFERENCE=secondaryPreferred.
+READ_PREFERENCES = {
+    "primary": Primary,
+    "primaryPreferred": PrimaryPreferred,
+    "secondary": Secondary,
+    "secondaryPreferred": SecondaryPreferred,
+    "nearest": Nearest,
+}
+READ_MAX_STALENESS_SECONDS = int(os.environ.get('READ_MAX_STALENESS_SECONDS', '90'))  # MongoDB minimum is 90
+
+def database_with_read_preference(env_var: str):
+    mode = os.environ.get(env_var, 'primary')
+    if mode not in READ_PREFERENCES:
+        raise ValueError(f"{env_var} must be one of {', '.join(READ_PREFERENCES)}, got {mode!r}")
+    if mode == 'primary':
+        return db
+    read_preference = READ_PREFERENCES[mode](max_staleness=READ_MAX_STALENESS_SECONDS)
+    return client.get_database(os.environ['DB_NAME'], read_preference=read_preference)
+
+catalog_db = database_with_read_preference('CATALOG_READ_PREFERENCE')
+analytics_db = database_with_read_preference('ANALYTICS_READ_PREFERENCE')
+
 # JWT Configuration
 SECRET_KEY = os.environ.get('SECRET_KEY', 'your-secret-key-change-this-in-production')
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
 
+# Order archival: delivered/cancelled orders older than this move to orders_archive (0 disables)
+ORDER_ARCHIVE_AFTER_DAYS = int(os.environ.get('ORDER_ARCHIVE_AFTER_DAYS', '0'))
+ORDER_ARCHIVE_INTERVAL_SECONDS = int(os.environ.get('ORDER_ARCHIVE_INTERVAL_SECONDS', '3600'))
+ORDER_ARCHIVE_BATCH_SIZE = int(os.environ.get('ORDER_ARCHIVE_BATCH_SIZE', '1000'))
+ARCHIVABLE_ORDER_STATUSES = ["delivered", "cancelled"]
+
+# Order ingestion: with ORDER_BATCH_DELAY_MS > 0, single orders placed at the same moment share one
+# insert_many, written when ORDER_BATCH_MAX_SIZE orders are waiting or the delay has passed
+ORDER_BATCH_DELAY_MS = float(os.environ.get('ORDER_BATCH_DELAY_MS', '0'))
+ORDER_BATCH_MAX_SIZE = int(os.environ.get('ORDER_BATCH_MAX_SIZE', '100'))
+ORDER_BATCH_TIMEOUT_SECONDS = float(os.environ.get('ORDER_BATCH_TIMEOUT_SECONDS', '10'))  # per batch write
+
+def env_pairs(name: str, cast) -> dict:
+    """Read an environment variable of comma separated key=value pairs, e.g. "a=1,b=2"."""
+    return {
+        key.strip(): cast(value)
+        for key, value in (pair.split('=') for pair in os.environ.get(name, '').split(',') if pair.strip())
+    }
+
+# Background jobs: JOB_WORKERS jobs run at once in this process (0 disables the workers), and
+# JOB_CONCURRENCY caps individual types, e.g. JOB_CONCURRENCY=seed_data=1,statement=4
+JOB_WORKERS = int(os.environ.get('JOB_WORKERS', '4'))
+JOB_CONCURRENCY = env_pairs('JOB_CONCURRENCY', int)
+JOB_DEFAULT_CONCURRENCY = int(os.environ.get('JOB_DEFAULT_CONCURRENCY', '2'))
+JOB_MAX_ATTEMPTS = int(os.environ.get('JOB_MAX_ATTEMPTS', '3'))
+JOB_RETRY_BACKOFF_SECONDS = int(os.environ.get('JOB_RETRY_BACKOFF_SECONDS', '30'))  # doubles on each retry
+JOB_LEASE_SECONDS = int(os.environ.get('JOB_LEASE_SECONDS', '300'))  # a job whose worker stops renewing is retaken
+JOB_POLL_INTERVAL_SECONDS = float(os.environ.get('JOB_POLL_INTERVAL_SECONDS', '1'))
+JOB_RETENTION_SECONDS = int(os.environ.get('JOB_RETENTION_SECONDS', str(7 * 24 * 3600)))  # finished jobs, via TTL index
+
+# Cache invalidation bus: size of the capped collection that carries events between processes
+# (0 disables it). Resuming replays this many seconds of events to cover clock skew between writers.
+INVALIDATION_BUS_BYTES = int(os.environ.get('INVALIDATION_BUS_BYTES', str(8 * 1024 * 1024)))
+INVALIDATION_RESUME_OVERLAP_SECONDS = float(os.environ.get('INVALIDATION_RESUME_OVERLAP_SECONDS', '5'))
+INVALIDATION_RETRY_SECONDS = float(os.environ.get('INVALIDATION_RETRY_SECONDS', '1'))
+
+# Price/stock history: samples older than this are expired by MongoDB (0 keeps them forever)
+PRICE_HISTORY_RETENTION_DAYS = int(os.environ.get('PRICE_HISTORY_RETENTION_DAYS', '0'))
+
+# Request deadlines in seconds per route class (see route_class); clients can only shorten them
+REQUEST_DEADLINES = {"analytics": 30.0, "orders": 10.0, "catalog": 5.0, "default": 10.0,
+                     **env_pairs('REQUEST_DEADLINES', float)}
+REQUEST_MIN_BUDGET_MS = int(os.environ.get('REQUEST_MIN_BUDGET_MS', '50'))  # less than this is shed with 503
+# Requests of a class allowed in flight at once; 0 means unlimited
+ROUTE_CLASS_MAX_IN_FLIGHT = {"analytics": 8, **env_pairs('ROUTE_CLASS_MAX_IN_FLIGHT', int)}
+
+# Response compression for the list endpoints
+COMPRESSION_MIN_BYTES = int(os.environ.get('COMPRESSION_MIN_BYTES', '1024'))
+GZIP_LEVEL = int(os.environ.get('GZIP_LEVEL', '6'))
+BROTLI_QUALITY = int(os.environ.get('BROTLI_QUALITY', '5'))
+
 # Password hashing
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 security = HTTPBearer()
@@ -49,12 +146,27 @@ app = FastAPI(title="Street Food Vendor Platform", version="1.0.0")
 api_router = APIRouter(prefix="/api")
 
 # Define Models
+class GeoPoint(BaseModel):
+    type: Literal["Point"] = "Point"
+    coordinates: List[float]  # GeoJSON order: [longitude, latitude]
+
+    @field_validator("coordinates")
+    @classmethod
+    def check_coordinates(cls, value):
+        if len(value) != 2:
+            raise ValueError("coordinates must be [longitude, latitude]")
+        lng, lat = value
+        if not -180 <= lng <= 180 or not -90 <= lat <= 90:
+            raise ValueError("coordinates out of range")
+        return value
+
 class UserBase(BaseModel):
     email: EmailStr
     name: str
     phone: str
     address: str
     user_type: str  # 'vendor' or 'supplier'
+    location: Optional[GeoPoint] = None
 
 class UserCreate(UserBase):
     password: str
@@ -77,6 +189,10 @@ class UserResponse(BaseModel):
     user_type: str
     created_at: datetime
     is_active: bool
+    location: Optional[GeoPoint] = None
+
+class NearbySupplier(UserResponse):
+    distance_km: float
 
 class Token(BaseModel):
     access_token: str
@@ -94,8 +210,31 @@ class Product(BaseModel):
     min_order_quantity: int
     stock_quantity: int
     created_at: datetime = Field(default_factory=datetime.utcnow)
+    updated_at: datetime = Field(default_factory=datetime.utcnow)
     is_active: bool = True
 
+class ProductChanges(BaseModel):
+    changes: List[Product]  # inserted or updated active products
+    deleted: List[str]  # ids of deactivated products
+    token: str  # pass back as `since` on the next sync
+    has_more: bool
+
+class FacetCount(BaseModel):
+    value: str
+    count: int
+
+class PriceBandCount(BaseModel):
+    min_price: float
+    max_price: Optional[float] = None  # None for the open-ended top band
+    count: int
+
+class ProductFacets(BaseModel):
+    categories: List[FacetCount]
+    units: List[FacetCount]
+    price_bands: List[PriceBandCount]
+    total: int  # products matching the whole selection
+    version: str  # facet version the counts were computed against
+
 class ProductCreate(BaseModel):
     name: str
     description: str
@@ -105,10 +244,44 @@ class ProductCreate(BaseModel):
     min_order_quantity: int
     stock_quantity: int
 
+class ProductUpdate(BaseModel):
+    product_id: str
+    stock_quantity: Optional[int] = Field(None, ge=0)
+    price: Optional[float] = Field(None, gt=0)
+    is_active: Optional[bool] = None
+
+class BulkProductUpdate(BaseModel):
+    updates: List[ProductUpdate] = Field(..., min_length=1, max_length=5000)
+
+class ProductUpdateFailure(BaseModel):
+    product_id: str
+    error: str
+
+class BulkProductUpdateResult(BaseModel):
+    matched: int  # updates for products the supplier owns
+    modified: int  # products whose values actually changed
+    failures: List[ProductUpdateFailure]
+
+class PriceHistoryPoint(BaseModel):
+    period_start: datetime
+    price_open: float
+    price_close: float
+    price_min: float
+    price_max: float
+    price_change: Optional[float] = None  # close minus the previous period's close
+    stock_close: int
+    stock_min: int
+    samples: int
+
+class ProductPriceHistory(BaseModel):
+    product_id: str
+    interval: str
+    points: List[PriceHistoryPoint]
+
 class OrderItem(BaseModel):
     product_id: str
     product_name: str
-    quantity: int
+    quantity: int = Field(gt=0)  # reserving a negative quantity would add stock
     price: float
     unit: str
     total: float
@@ -126,6 +299,77 @@ class Order(BaseModel):
     created_at: datetime = Field(default_factory=datetime.utcnow)
     updated_at: datetime = Field(default_factory=datetime.utcnow)
     delivery_date: Optional[datetime] = None
+    stock_reserved: bool = False  # item quantities were taken out of product stock
+
+# Allowed status changes; delivered and cancelled are final
+ORDER_TRANSITIONS = {
+    "pending": {"confirmed", "cancelled"},
+    "confirmed": {"delivered", "cancelled"},
+    "delivered": set(),
+    "cancelled": set(),
+}
+
+class Counterparty(BaseModel):
+    id: str
+    name: str
+    phone: str
+    address: str
+
+class OrderWithCounterparty(Order):
+    counterparty: Optional[Counterparty] = None  # the supplier for vendors, the vendor for suppliers
+
+class FrequentItem(BaseModel):
+    product_id: str
+    product_name: str
+    unit: str
+    order_count: int  # orders that included the product
+    usual_quantity: int  # average quantity per order
+    last_ordered_at: datetime
+    price: Optional[float] = None  # current price, None if the product is gone
+    stock_quantity: Optional[int] = None
+    available: bool
+
+class SupplierFrequentItems(BaseModel):
+    supplier_id: str
+    items: List[FrequentItem]
+
+# First-paint dashboard payloads from /api/bootstrap; `more_*` flags mark a truncated first page
+class VendorBootstrap(BaseModel):
+    user: UserResponse
+    categories: List[str]
+    suppliers: List[UserResponse]
+    products: List[Product]
+    more_products: bool
+    orders: List[OrderWithCounterparty]
+    more_orders: bool
+
+class SupplierBootstrap(BaseModel):
+    user: UserResponse
+    products: List[Product]  # the supplier's own catalog
+    more_products: bool
+    orders: List[OrderWithCounterparty]
+    more_orders: bool
+
+# Restock suggestions from /api/analytics/forecast; demand figures are in product units
+class ProductForecast(BaseModel):
+    product_id: str
+    name: str
+    unit: str
+    stock_quantity: int
+    daily_demand: float  # smoothed units per day
+    forecast: List[float]  # expected units for each of the next horizon days
+    days_of_stock: Optional[float] = None  # None when there is no demand
+    suggested_restock: int
+
+class SupplierForecast(BaseModel):
+    method: str
+    history_days: int
+    horizon_days: int
+    products: List[ProductForecast]  # most urgent restock first
+
+class OrderStatusUpdate(BaseModel):
+    status: str
+    expected_updated_at: Optional[datetime] = None  # reject with 409 if the order changed since
 
 class OrderCreate(BaseModel):
     supplier_id: str
@@ -133,6 +377,14 @@ class OrderCreate(BaseModel):
     delivery_address: str
     delivery_date: Optional[datetime] = None
 
+class CartItem(OrderItem):
+    supplier_id: str
+
+class CheckoutRequest(BaseModel):
+    items: List[CartItem]
+    delivery_address: str
+    delivery_date: Optional[datetime] = None
+
 class SupplierInfo(BaseModel):
     name: str
     address: str
@@ -147,6 +399,84 @@ class VendorInfo(BaseModel):
     email: str
     business_name: Optional[str] = None
 
+class Job(BaseModel):
+    id: str = Field(default_factory=lambda: str(uuid.uuid4()))
+    type: str
+    owner_id: str
+    params: dict = {}
+    status: Literal["queued", "running", "succeeded", "failed"] = "queued"
+    progress: float = 0.0  # fraction done, reported by the handler
+    result: Optional[dict] = None
+    error: Optional[str] = None
+    attempts: int = 0
+    max_attempts: int = JOB_MAX_ATTEMPTS
+    run_after: datetime = Field(default_factory=datetime.utcnow)
+    lease_until: Optional[datetime] = None
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+    updated_at: datetime = Field(default_factory=datetime.utcnow)
+    finished_at: Optional[datetime] = None
+    expires_at: Optional[datetime] = None  # set when finished; the TTL index deletes the job then
+
+# Catalog used by /api/seed-data and the synthetic data generator
+SAMPLE_PRODUCTS = [
+    # Fruits
+    {"name": "Fresh Apples", "description": "Premium quality red apples", "price": 120.0, "unit": "kg", "category": "Fruits", "min_order_quantity": 5, "stock_quantity": 100},
+    {"name": "Bananas", "description": "Fresh yellow bananas", "price": 60.0, "unit": "kg", "category": "Fruits", "min_order_quantity": 10, "stock_quantity": 150},
+    {"name": "Fresh Oranges", "description": "Juicy oranges", "price": 80.0, "unit": "kg", "category": "Fruits", "min_order_quantity": 5, "stock_quantity": 80},
+    {"name": "Mangoes", "description": "Sweet alphonso mangoes", "price": 200.0, "unit": "kg", "category": "Fruits", "min_order_quantity": 3, "stock_quantity": 50},
+    {"name": "Grapes", "description": "Fresh green grapes", "price": 150.0, "unit": "kg", "category": "Fruits", "min_order_quantity": 2, "stock_quantity": 40},
+    
+    # Vegetables
+    {"name": "Fresh Tomatoes", "description": "Premium quality fresh tomatoes", "price": 45.0, "unit": "kg", "category": "Vegetables", "min_order_quantity": 5, "stock_quantity": 200},
+    {"name": "Onions", "description": "Fresh red onions", "price": 35.0, "unit": "kg", "category": "Vegetables", "min_order_quantity": 10, "stock_quantity": 300},
+    {"name": "Potatoes", "description": "Fresh potatoes", "price": 25.0, "unit": "kg", "category": "Vegetables", "min_order_quantity": 10, "stock_quantity": 500},
+    {"name": "Bell Peppers", "description": "Colorful bell peppers", "price": 80.0, "unit": "kg", "category": "Vegetables", "min_order_quantity": 3, "stock_quantity": 60},
+    {"name": "Carrots", "description": "Fresh carrots", "price": 55.0, "unit": "kg", "category": "Vegetables", "min_order_quantity": 5, "stock_quantity": 120},
+    
+    # Spices
+    {"name": "Turmeric Powder", "description": "Pure turmeric powder", "price": 200.0, "unit": "kg", "category": "Spices", "min_order_quantity": 1, "stock_quantity": 30},
+    {"name": "Red Chili Powder", "description": "Spicy red chili powder", "price": 300.0, "unit": "kg", "category": "Spices", "min_order_quantity": 1, "stock_quantity": 25},
+    {"name": "Cumin Seeds", "description": "Whole cumin seeds", "price": 400.0, "unit": "kg", "category": "Spices", "min_order_quantity": 1, "stock_quantity": 20},
+    {"name": "Coriander Seeds", "description": "Fresh coriander seeds", "price": 180.0, "unit": "kg", "category": "Spices", "min_order_quantity": 1, "stock_quantity": 35},
+    {"name": "Garam Masala", "description": "Authentic garam masala blend", "price": 500.0, "unit": "kg", "category": "Spices", "min_order_quantity": 1, "stock_quantity": 15},
+    
+    # Dairy
+    {"name": "Fresh Milk", "description": "Pure cow milk", "price": 55.0, "unit": "liters", "category": "Dairy", "min_order_quantity": 10, "stock_quantity": 100},
+    {"name": "Paneer", "description": "Fresh cottage cheese", "price": 250.0, "unit": "kg", "category": "Dairy", "min_order_quantity": 2, "stock_quantity": 40},
+    {"name": "Butter", "description": "Fresh butter", "price": 300.0, "unit": "kg", "category": "Dairy", "min_order_quantity": 1, "stock_quantity": 25},
+    {"name": "Yogurt", "description": "Fresh yogurt", "price": 80.0, "unit": "kg", "category": "Dairy", "min_order_quantity": 5, "stock_quantity": 60},
+    
+    # Grains
+    {"name": "Basmati Rice", "description": "Premium basmati rice", "price": 120.0, "unit": "kg", "category": "Grains", "min_order_quantity": 10, "stock_quantity": 200},
+    {"name": "Wheat Flour", "description": "Fresh wheat flour", "price": 45.0, "unit": "kg", "category": "Grains", "min_order_quantity": 20, "stock_quantity": 500},
+    {"name": "Lentils (Dal)", "description": "Mixed lentils", "price": 90.0, "unit": "kg", "category": "Grains", "min_order_quantity": 5, "stock_quantity": 150},
+    {"name": "Quinoa", "description": "Organic quinoa", "price": 400.0, "unit": "kg", "category": "Grains", "min_order_quantity": 2, "stock_quantity": 30},
+    
+    # Beverages
+    {"name": "Coconut Water", "description": "Fresh coconut water", "price": 40.0, "unit": "liters", "category": "Beverages", "min_order_quantity": 10, "stock_quantity": 80},
+    {"name": "Fresh Juice", "description": "Mixed fruit juice", "price": 60.0, "unit": "liters", "category": "Beverages", "min_order_quantity": 5, "stock_quantity": 50},
+    {"name": "Lassi", "description": "Traditional yogurt drink", "price": 50.0, "unit": "liters", "category": "Beverages", "min_order_quantity": 5, "stock_quantity": 40},
+    
+    # Bakery
+    {"name": "Bread", "description": "Fresh bread loaves", "price": 35.0, "unit": "pieces", "category": "Bakery", "min_order_quantity": 10, "stock_quantity": 100},
+    {"name": "Buns", "description": "Fresh burger buns", "price": 5.0, "unit": "pieces", "category": "Bakery", "min_order_quantity": 50, "stock_quantity": 200},
+    {"name": "Cookies", "description": "Assorted cookies", "price": 200.0, "unit": "kg", "category": "Bakery", "min_order_quantity": 2, "stock_quantity": 30},
+    
+    # Oils & Condiments
+    {"name": "Sunflower Oil", "description": "Pure sunflower oil", "price": 150.0, "unit": "liters", "category": "Oils & Condiments", "min_order_quantity": 5, "stock_quantity": 60},
+    {"name": "Mustard Oil", "description": "Pure mustard oil", "price": 180.0, "unit": "liters", "category": "Oils & Condiments", "min_order_quantity": 3, "stock_quantity": 40},
+    {"name": "Vinegar", "description": "Apple cider vinegar", "price": 120.0, "unit": "liters", "category": "Oils & Condiments", "min_order_quantity": 2, "stock_quantity": 25},
+    
+    # Frozen Items
+    {"name": "Frozen Vegetables", "description": "Mixed frozen vegetables", "price": 100.0, "unit": "kg", "category": "Frozen Items", "min_order_quantity": 5, "stock_quantity": 80},
+    {"name": "Frozen Fruits", "description": "Mixed frozen fruits", "price": 150.0, "unit": "kg", "category": "Frozen Items", "min_order_quantity": 3, "stock_quantity": 40},
+    
+    # Disposables
+    {"name": "Paper Plates", "description": "Disposable paper plates", "price": 2.0, "unit": "pieces", "category": "Disposables", "min_order_quantity": 100, "stock_quantity": 1000},
+    {"name": "Plastic Cups", "description": "Disposable plastic cups", "price": 1.5, "unit": "pieces", "category": "Disposables", "min_order_quantity": 100, "stock_quantity": 1500},
+    {"name": "Food Containers", "description": "Takeaway food containers", "price": 8.0, "unit": "pieces", "category": "Disposables", "min_order_quantity": 50, "stock_quantity": 500},
+]
+
 # Utility functions
 def verify_password(plain_password, hashed_password):
     return pwd_context.verify(plain_password, hashed_password)
@@ -164,6 +494,802 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
+def build_order(vendor_id: str, supplier_id: str, items: List[OrderItem], delivery_address: str,
+                delivery_date: Optional[datetime] = None) -> Order:
+    # Calculate totals
+    subtotal = sum(item.total for item in items)
+    tax = subtotal * 0.18  # 18% tax
+    total = subtotal + tax
+    return Order(
+        vendor_id=vendor_id,
+        supplier_id=supplier_id,
+        items=items,
+        subtotal=subtotal,
+        tax=tax,
+        total=total,
+        delivery_address=delivery_address,
+        delivery_date=delivery_date,
+    )
+
+def _quantities_by_product(items: List[OrderItem]):
+    quantities = {}
+    for item in items:
+        quantities[item.product_id] = quantities.get(item.product_id, 0) + item.quantity
+    return quantities
+
+async def release_stock(items: List[OrderItem], session=None):
+    now = datetime.utcnow()
+    await db.products.bulk_write([
+        UpdateOne({"id": product_id}, {"$inc": {"stock_quantity": quantity}, "$set": {"updated_at": now}})
+        for product_id, quantity in _quantities_by_product(items).items()
+    ], ordered=False, session=session)
+
+# Compensating writes get their own budget: the request's deadline may be what just failed it
+COMPENSATION_TIMEOUT_SECONDS = 30
+
+async def run_compensation(coro, restores: str = "product stock"):
+    """Run a compensating write to completion in a task of its own, outside the request's
+    pymongo.timeout() and unaffected if the request itself is cancelled."""
+    async def bounded():
+        try:
+            with pymongo.timeout(COMPENSATION_TIMEOUT_SECONDS):
+                await coro
+        except PyMongoError:
+            # The original failure is what the caller needs to see
+            logger.exception(f"Compensating write failed; {restores} needs checking")
+    await asyncio.shield(contextvars.Context().run(asyncio.create_task, bounded()))
+
+async def release_unplaced_stock(orders: List[Order]):
+    """Hand back the stock of reserved orders that didn't make it into the orders collection.
+
+    Looks the orders up first, so it is safe after an insert whose outcome is unknown.
+    """
+    if not orders:
+        return
+    inserted = set(await db.orders.distinct("id", {"id": {"$in": [order_obj.id for order_obj in orders]}}))
+    for order_obj in orders:
+        if order_obj.id not in inserted:
+            await release_stock(order_obj.items)
+
+async def reserve_stock(order_obj: Order, session=None):
+    """Take the order's quantities out of the supplier's stock, all lines or none."""
+    reserved = []
+    try:
+        for product_id, quantity in _quantities_by_product(order_obj.items).items():
+            result = await db.products.update_one(
+                {"id": product_id, "supplier_id": order_obj.supplier_id, "is_active": True,
+                 "stock_quantity": {"$gte": quantity}},
+                {"$inc": {"stock_quantity": -quantity}, "$set": {"updated_at": datetime.utcnow()}},
+                session=session,
+            )
+            if result.modified_count == 0:
+                name = next(item.product_name for item in order_obj.items if item.product_id == product_id)
+                product = await db.products.find_one({"id": product_id}, {"_id": 0, "supplier_id": 1, "is_active": 1},
+                                                     session=session)
+                if product is None or not product.get("is_active", True):
+                    raise HTTPException(status_code=404, detail=f"{name} is no longer available")
+                if product["supplier_id"] != order_obj.supplier_id:
+                    raise HTTPException(status_code=400, detail=f"{name} is not sold by this supplier")
+                raise HTTPException(status_code=409, detail=f"Insufficient stock for {name}")
+            reserved.extend(item for item in order_obj.items if item.product_id == product_id)
+    except BaseException:
+        # Inside a transaction the abort undoes the lines already taken
+        if reserved and session is None:
+            await run_compensation(release_stock(reserved))
+        raise
+    order_obj.stock_reserved = True
+
+async def record_price_history(product_ids: List[str]):
+    """Sample the current price and stock of products into the product_price_history time series.
+
+    Called after writes that change either. Time-series collections can't be written inside a
+    transaction, so this runs after commit, and a failure is logged rather than failing the write.
+    """
+    if not product_ids:
+        return
+    try:
+        products = await db.products.find(
+            {"id": {"$in": list(product_ids)}}, {"_id": 0, "id": 1, "price": 1, "stock_quantity": 1}
+        ).to_list(len(product_ids))
+        now = datetime.utcnow()
+        await db.product_price_history.insert_many([
+            {"recorded_at": now, "product_id": product["id"], "price": product["price"],
+             "stock_quantity": product["stock_quantity"]}
+            for product in products
+        ], ordered=False)
+    except PyMongoError:
+        logger.exception(f"Could not record price history for {len(product_ids)} products")
+
+async def place_orders(orders: List[Order]):
+    """Reserve stock for and insert new orders, atomically when the deployment supports transactions."""
+    if order_batcher is not None and len(orders) == 1:
+        # Micro-batched ingestion: the stock is reserved per order and the insert is shared,
+        # so as on a standalone server a failed insert hands the stock back afterwards
+        await reserve_stock(orders[0])
+        await order_batcher.submit(orders[0])
+        return
+    if await supports_transactions():
+        async with await client.start_session() as session:
+            async with session.start_transaction():
+                for order_obj in orders:
+                    await reserve_stock(order_obj, session=session)
+                await db.orders.insert_many([order_obj.dict() for order_obj in orders], session=session)
+    else:
+        # Standalone server: whatever fails (stock, a write error, a network error or the
+        # request deadline), hand back the stock of every reserved order that wasn't inserted
+        reserved = []
+        try:
+            for order_obj in orders:
+                await reserve_stock(order_obj)
+                reserved.append(order_obj)
+            await db.orders.insert_many([order_obj.dict() for order_obj in orders], ordered=True)
+        except BaseException:
+            await run_compensation(release_unplaced_stock(reserved))
+            raise
+    await record_vendor_purchases(orders)
+    await record_price_history(list({item.product_id for order_obj in orders for item in order_obj.items}))
+
+class OrderBatcher:
+    """Coalesces concurrently placed orders into unordered insert_many micro-batches.
+
+    A batch is written once it holds max_size orders, or max_delay seconds after its first
+    order arrived. Every caller awaits the outcome of its own order. The batch hands back the
+    stock of orders that weren't inserted, so a request that stops waiting can't leak stock.
+    Batches are scheduled in an empty context: they run on ORDER_BATCH_TIMEOUT_SECONDS, not on
+    the deadline of whichever request happened to open or fill them.
+    """
+
+    def __init__(self, max_size: int, max_delay: float):
+        self.max_size = max_size
+        self.max_delay = max_delay
+        self._pending: List[tuple] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._writes: set = set()
+
+    async def submit(self, order_obj: Order):
+        """Queue a stock-reserved order and wait until its batch has been written."""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((order_obj, future))
+        if len(self._pending) >= self.max_size:
+            self.flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.max_delay, self.flush, context=contextvars.Context())
+        await asyncio.shield(future)
+
+    def flush(self):
+        """Start writing the waiting orders now."""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, []
+        if batch:
+            task = contextvars.Context().run(asyncio.create_task, self._write(batch))
+            self._writes.add(task)
+            task.add_done_callback(self._writes.discard)
+
+    async def drain(self):
+        """Write out the waiting orders and wait for batches in flight, e.g. at shutdown."""
+        self.flush()
+        if self._writes:
+            await asyncio.gather(*self._writes, return_exceptions=True)
+
+    async def _write(self, batch: List[tuple]):
+        orders = [order_obj for order_obj, _ in batch]
+        error, present = None, None
+        try:
+            try:
+                with pymongo.timeout(ORDER_BATCH_TIMEOUT_SECONDS):
+                    await db.orders.insert_many([order_obj.dict() for order_obj in orders], ordered=False)
+                present = {order_obj.id for order_obj in orders}
+            except Exception as exc:
+                # Unordered, and a network error or timeout leaves the outcome unknown, so look
+                # up which orders landed instead of guessing
+                error = exc
+                with pymongo.timeout(COMPENSATION_TIMEOUT_SECONDS):
+                    present = set(await db.orders.distinct("id", {"id": {"$in": [order_obj.id for order_obj in orders]}}))
+            
+            with pymongo.timeout(COMPENSATION_TIMEOUT_SECONDS):
+                for order_obj in orders:
+                    if order_obj.id not in present:
+                        await release_stock(order_obj.items)
+                inserted = [order_obj for order_obj in orders if order_obj.id in present]
+                await record_vendor_purchases(inserted)
+                await record_price_history(list({item.product_id for order_obj in inserted for item in order_obj.items}))
+        except PyMongoError:
+            logger.exception(f"Could not finish a batch of {len(batch)} orders")
+        finally:
+            # A write concern error fails every caller, as it would a single insert; orders that
+            # can't be confirmed fail and keep their stock reserved
+            concern_error = isinstance(error, BulkWriteError) and bool(error.details.get("writeConcernErrors"))
+            for order_obj, future in batch:
+                if error is None or (present is not None and order_obj.id in present and not concern_error):
+                    future.set_result(None)
+                else:
+                    future.set_exception(error or PyMongoError("Order batch could not be confirmed"))
+
+order_batcher = OrderBatcher(ORDER_BATCH_MAX_SIZE, ORDER_BATCH_DELAY_MS / 1000) if ORDER_BATCH_DELAY_MS > 0 else None
+
+# A summary build that hasn't finished within this long is assumed dead and is started over
+VENDOR_SUMMARY_BUILD_TIMEOUT_SECONDS = 300
+
+def _purchase(order_obj: Order) -> dict:
+    """One order's contribution to its vendor's purchase summary."""
+    items = {item.product_id: {"product_name": item.product_name, "unit": item.unit}
+             for item in order_obj.items}
+    for product_id, quantity in _quantities_by_product(order_obj.items).items():
+        items[product_id]["quantity"] = quantity
+    return {"supplier_id": order_obj.supplier_id, "created_at": order_obj.created_at, "items": items}
+
+async def record_vendor_purchases(orders: List[Order]):
+    """Fold newly placed orders into their vendor's purchase summary, if it has been built yet.
+
+    The summary keeps one entry per product the vendor has bought, so frequent items are
+    a single document read. Missing summaries are built from order history on first use.
+    While a build runs, orders are parked under `pending` for the build to merge; orders
+    the build already counted are listed in `counted_orders` and skipped.
+
+    Runs after the orders are saved, so a failure is logged rather than failing the request,
+    and the affected summaries are dropped to be rebuilt with these orders included.
+    """
+    updates = []
+    for order_obj in orders:
+        purchase = _purchase(order_obj)
+        increments, latest, details = {}, {}, {}
+        for product_id, item in purchase["items"].items():
+            key = f"items.{product_id}"
+            increments[f"{key}.order_count"] = 1
+            increments[f"{key}.total_quantity"] = item["quantity"]
+            latest[f"{key}.last_ordered_at"] = order_obj.created_at
+            details[f"{key}.supplier_id"] = order_obj.supplier_id
+            details[f"{key}.product_name"] = item["product_name"]
+            details[f"{key}.unit"] = item["unit"]
+        # At most one of the two matches: a summary is either being built or built
+        updates.append(UpdateOne(
+            {"vendor_id": order_obj.vendor_id, "building": True},
+            {"$set": {f"pending.{order_obj.id}": purchase}},
+        ))
+        updates.append(UpdateOne(
+            {"vendor_id": order_obj.vendor_id, "building": {"$ne": True}, "counted_orders": {"$ne": order_obj.id}},
+            {"$inc": increments, "$max": latest, "$set": details},
+        ))
+    if not updates:
+        return
+    try:
+        await db.vendor_order_summaries.bulk_write(updates, ordered=False)
+    except PyMongoError:
+        logger.exception(f"Could not record purchases for {len(orders)} orders")
+        vendor_ids = list({order_obj.vendor_id for order_obj in orders})
+        await run_compensation(db.vendor_order_summaries.delete_many({"vendor_id": {"$in": vendor_ids}}),
+                               restores="vendor purchase summary")
+
+async def aggregate_vendor_purchases(vendor_id: str, exclude: List[str], recent_since: datetime) -> dict:
+    """Fold a vendor's order history (hot and archived) into per-product summary entries.
+
+    Also returns the ids of the orders counted that were created since `recent_since`, whose
+    record_vendor_purchases call may still be on its way.
+    """
+    match = {"$match": {"vendor_id": vendor_id, "id": {"$nin": exclude}}}
+    pipeline = [
+        match,
+        {"$unionWith": {"coll": "orders_archive", "pipeline": [match]}},
+        {"$facet": {
+            "items": [
+                {"$sort": {"created_at": 1}},
+                {"$unwind": "$items"},
+                {"$group": {
+                    "_id": {"order": "$id", "product_id": "$items.product_id"},
+                    "supplier_id": {"$last": "$supplier_id"},
+                    "product_name": {"$last": "$items.product_name"},
+                    "unit": {"$last": "$items.unit"},
+                    "quantity": {"$sum": "$items.quantity"},
+                    "created_at": {"$last": "$created_at"},
+                }},
+                {"$sort": {"created_at": 1}},
+                {"$group": {
+                    "_id": "$_id.product_id",
+                    "supplier_id": {"$last": "$supplier_id"},
+                    "product_name": {"$last": "$product_name"},
+                    "unit": {"$last": "$unit"},
+                    "order_count": {"$sum": 1},
+                    "total_quantity": {"$sum": "$quantity"},
+                    "last_ordered_at": {"$max": "$created_at"},
+                }},
+            ],
+            "recent": [
+                {"$match": {"created_at": {"$gte": recent_since}}},
+                {"$project": {"_id": 0, "id": 1}},
+            ],
+        }},
+    ]
+    result = (await db.orders.aggregate(pipeline).to_list(1))[0]
+    items = {}
+    for row in result["items"]:
+        product_id = row.pop("_id")
+        items[product_id] = row
+    return {"items": items, "recent": [order["id"] for order in result["recent"]]}
+
+async def build_vendor_summary(vendor_id: str) -> dict:
+    """Build a vendor's purchase summary from order history and store it.
+
+    The summary document is claimed before history is read, so orders placed during the
+    build are parked under `pending` rather than lost. The merge only lands if `pending` is
+    unchanged since it was read, and records the recent orders it counted so their own
+    record_vendor_purchases calls don't count them twice.
+    """
+    started_at = datetime.utcnow()
+    # Orders older than this have had their record_vendor_purchases call long before the build
+    recent_since = started_at - timedelta(seconds=SYNC_SAFETY_LAG_SECONDS)
+    await db.vendor_order_summaries.delete_one({
+        "vendor_id": vendor_id, "building": True,
+        "started_at": {"$lt": started_at - timedelta(seconds=VENDOR_SUMMARY_BUILD_TIMEOUT_SECONDS)},
+    })
+    try:
+        claim = await db.vendor_order_summaries.update_one(
+            {"vendor_id": vendor_id},
+            {"$setOnInsert": {"vendor_id": vendor_id, "items": {}, "building": True, "started_at": started_at,
+                              "pending": {}}},
+            upsert=True,
+        )
+        claimed = claim.upserted_id is not None
+    except DuplicateKeyError:
+        claimed = False
+    if not claimed:
+        # Another request is building, or has just built, the stored summary
+        history = await aggregate_vendor_purchases(vendor_id, [], recent_since)
+        return {"vendor_id": vendor_id, "items": history["items"]}
+    
+    try:
+        while True:
+            claim = await db.vendor_order_summaries.find_one({"vendor_id": vendor_id, "building": True},
+                                                             {"pending": 1})
+            if claim is None:
+                # Dropped by a failed record_vendor_purchases; the next request builds again
+                history = await aggregate_vendor_purchases(vendor_id, [], recent_since)
+                return {"vendor_id": vendor_id, "items": history["items"]}
+            pending = claim["pending"]
+            history = await aggregate_vendor_purchases(vendor_id, list(pending), recent_since)
+            items = history["items"]
+            for purchase in sorted(pending.values(), key=lambda purchase: purchase["created_at"]):
+                for product_id, item in purchase["items"].items():
+                    entry = items.setdefault(product_id, {"order_count": 0, "total_quantity": 0,
+                                                          "last_ordered_at": purchase["created_at"]})
+                    entry.update(supplier_id=purchase["supplier_id"], product_name=item["product_name"],
+                                 unit=item["unit"])
+                    entry["order_count"] += 1
+                    entry["total_quantity"] += item["quantity"]
+                    entry["last_ordered_at"] = max(entry["last_ordered_at"], purchase["created_at"])
+            merged = await db.vendor_order_summaries.update_one(
+                {"vendor_id": vendor_id, "building": True, "pending": pending},
+                {"$set": {"items": items, "counted_orders": history["recent"] + list(pending)},
+                 "$unset": {"building": "", "started_at": "", "pending": ""}},
+            )
+            if merged.modified_count:
+                return {"vendor_id": vendor_id, "items": items}
+            # An order was parked while history was read; merge again with it excluded
+    except BaseException:
+        # The next request builds again from scratch; parked orders are in order history too
+        await run_compensation(db.vendor_order_summaries.delete_one({"vendor_id": vendor_id, "building": True}),
+                               restores="vendor purchase summary")
+        raise
+
+async def find_order(query: dict, projection: Optional[dict] = None, session=None):
+    """Look an order up in the hot collection, then in the archive."""
+    order = await db.orders.find_one(query, projection, session=session)
+    if order is None:
+        order = await db.orders_archive.find_one(query, projection, session=session)
+    return order
+
+# User fields embedded into order listings and receipts through $lookup
+COUNTERPARTY_PROJECTION = {"_id": 0, "id": 1, "name": 1, "phone": 1, "address": 1}
+RECEIPT_PARTY_PROJECTION = {"_id": 0, "name": 1, "address": 1, "phone": 1, "email": 1,
+                            "business_name": 1, "gst_number": 1}
+
+def _lookup_user(local_field: str, projection: dict, as_field: str):
+    return {"$lookup": {
+        "from": "users",
+        "localField": local_field,
+        "foreignField": "id",
+        "pipeline": [{"$project": projection}],
+        "as": as_field,
+    }}
+
+def orders_with_counterparty_pipeline(query: dict, counterparty_field: str, limit: int,
+                                      sort: Optional[dict] = None):
+    return [
+        {"$match": query},
+        *([{"$sort": sort}] if sort else []),
+        {"$limit": limit},
+        _lookup_user(counterparty_field, COUNTERPARTY_PROJECTION, "counterparty"),
+        {"$unwind": {"path": "$counterparty", "preserveNullAndEmptyArrays": True}},
+    ]
+
+async def orders_change_token(query: dict, include_archived: bool, listing=None) -> str:
+    """Weak ETag for an order listing, computed from index entries only.
+
+    Every order write bumps updated_at, and new or archived orders change the counts,
+    so the tag changes whenever the listing can. The (party, updated_at) indexes answer
+    both queries without reading order documents. `query` is the party's whole history;
+    filters, sort and page go in `listing`, which only needs to be part of the tag.
+    """
+    latest_query = db.orders.find(query, {"_id": 0, "updated_at": 1}).sort("updated_at", -1).limit(1).to_list(1)
+    lookups = [db.orders.count_documents(query), latest_query]
+    if include_archived:
+        lookups.append(db.orders_archive.count_documents(query))
+    count, latest, *archived = await asyncio.gather(*lookups)
+    parts = [query, listing, count, latest[0]["updated_at"].isoformat() if latest else "", *archived]
+    return f'W/"{hashlib.sha1(repr(parts).encode()).hexdigest()}"'
+
+# Sort orders of /api/orders as (field, direction); id breaks ties, so a cursor is an exact position
+ORDER_SORTS = {"newest": ("created_at", -1), "oldest": ("created_at", 1),
+               "total_desc": ("total", -1), "total_asc": ("total", 1)}
+ORDER_PAGE_LIMIT = 1000
+
+def encode_order_cursor(sort: str, order: dict) -> str:
+    value = order[ORDER_SORTS[sort][0]]
+    raw = json.dumps([sort, value.isoformat() if isinstance(value, datetime) else value, order["id"]])
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+def decode_order_cursor(sort: str, cursor: str) -> tuple:
+    """The (sort value, id) of the last order on the previous page."""
+    try:
+        cursor_sort, value, order_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        if cursor_sort != sort or not isinstance(order_id, str):
+            raise ValueError(cursor)
+        if ORDER_SORTS[sort][0] == "created_at":
+            value = datetime.fromisoformat(value)
+        elif not isinstance(value, (int, float)):
+            raise ValueError(cursor)
+        return value, order_id
+    except (ValueError, TypeError, UnicodeDecodeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+def order_listing_query(party_query: dict, counterparty_field: str, statuses: List[str],
+                        start: Optional[datetime], end: Optional[datetime], counterparty_id: Optional[str],
+                        min_total: Optional[float], sort: str, cursor: Optional[str]):
+    """Filter and sort for an order listing, shaped to match the (party, filter, sort key, id) indexes."""
+    query = dict(party_query)
+    if statuses:
+        query["status"] = statuses[0] if len(statuses) == 1 else {"$in": statuses}
+    if counterparty_id:
+        query[counterparty_field] = counterparty_id
+    if start or end:
+        query["created_at"] = {}
+        if start:
+            query["created_at"]["$gte"] = start
+        if end:
+            query["created_at"]["$lt"] = end
+    if min_total is not None:
+        query["total"] = {"$gte": min_total}
+    field, direction = ORDER_SORTS[sort]
+    if cursor:
+        value, order_id = decode_order_cursor(sort, cursor)
+        after = "$lt" if direction < 0 else "$gt"
+        query["$or"] = [{field: {after: value}}, {field: value, "id": {after: order_id}}]
+    return query, {field: direction, "id": direction}
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    # Weak comparison, as If-None-Match requires
+    candidates = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+    return "*" in candidates or etag.removeprefix("W/") in candidates
+
+async def find_order_with_parties(order_id: str):
+    """An order joined with its vendor and supplier, checking the hot collection then the archive."""
+    pipeline = [
+        {"$match": {"id": order_id}},
+        {"$limit": 1},
+        _lookup_user("vendor_id", RECEIPT_PARTY_PROJECTION, "vendor"),
+        _lookup_user("supplier_id", RECEIPT_PARTY_PROJECTION, "supplier"),
+    ]
+    for collection in (db.orders, db.orders_archive):
+        orders = await collection.aggregate(pipeline).to_list(1)
+        if orders:
+            return orders[0]
+    return None
+
+async def archive_orders_batch(cutoff: datetime) -> int:
+    """Move one batch of finished orders older than `cutoff` into orders_archive."""
+    eligible = {"status": {"$in": ARCHIVABLE_ORDER_STATUSES}, "updated_at": {"$lt": cutoff}}
+    batch = await db.orders.find(eligible).sort("_id", 1).limit(ORDER_ARCHIVE_BATCH_SIZE).to_list(ORDER_ARCHIVE_BATCH_SIZE)
+    if not batch:
+        return 0
+    try:
+        await db.orders_archive.insert_many(batch, ordered=False)
+    except BulkWriteError as exc:
+        # An interrupted earlier run may already have copied part of this batch
+        if any(error["code"] != 11000 for error in exc.details["writeErrors"]):
+            raise
+    # Finished orders never change again, so every eligible order in the id range was copied above
+    await db.orders.delete_many({"_id": {"$gte": batch[0]["_id"], "$lte": batch[-1]["_id"]}, **eligible})
+    return len(batch)
+
+async def run_order_archival():
+    while True:
+        try:
+            cutoff = datetime.utcnow() - timedelta(days=ORDER_ARCHIVE_AFTER_DAYS)
+            moved = 0
+            while True:
+                count = await archive_orders_batch(cutoff)
+                moved += count
+                if count < ORDER_ARCHIVE_BATCH_SIZE:
+                    break
+            if moved:
+                logger.info(f"Archived {moved} orders finished before {cutoff.isoformat()}")
+        except Exception:
+            logger.exception("Order archival failed")
+        await asyncio.sleep(ORDER_ARCHIVE_INTERVAL_SECONDS)
+
+# Background jobs: handlers are registered per type and run by the worker pool started at startup
+JOB_HANDLERS: Dict[str, Callable[[dict], Awaitable[Optional[dict]]]] = {}
+_running_jobs: Dict[str, int] = {}
+_job_claim_lock = asyncio.Lock()
+
+def job_handler(job_type: str):
+    def register(func):
+        JOB_HANDLERS[job_type] = func
+        return func
+    return register
+
+async def enqueue_job(job_type: str, owner_id: str, params: Optional[dict] = None,
+                      max_attempts: int = JOB_MAX_ATTEMPTS) -> Job:
+    if job_type not in JOB_HANDLERS:
+        raise ValueError(f"Unknown job type {job_type!r}")
+    job = Job(type=job_type, owner_id=owner_id, params=params or {}, max_attempts=max_attempts)
+    await db.jobs.insert_one(job.dict())
+    return job
+
+async def report_job_progress(job_id: str, progress: float):
+    await db.jobs.update_one(
+        {"id": job_id, "status": "running"},
+        {"$set": {"progress": min(max(progress, 0.0), 1.0), "updated_at": datetime.utcnow()}},
+    )
+
+async def claim_job(job_types: List[str]) -> Optional[dict]:
+    """Atomically take the oldest runnable job of the given types.
+
+    Jobs left running by a worker that stopped renewing its lease are taken over as well.
+    """
+    now = datetime.utcnow()
+    return await db.jobs.find_one_and_update(
+        {
+            "type": {"$in": job_types},
+            "$or": [
+                {"status": "queued", "run_after": {"$lte": now}},
+                {"status": "running", "lease_until": {"$lt": now}},
+            ],
+        },
+        {
+            "$set": {"status": "running", "lease_until": now + timedelta(seconds=JOB_LEASE_SECONDS), "updated_at": now},
+            "$inc": {"attempts": 1},
+        },
+        sort=[("run_after", 1)],
+        projection={"_id": 0},
+        return_document=ReturnDocument.AFTER,
+    )
+
+def _claimed(job: dict) -> dict:
+    # A worker only updates the job while it still holds this attempt's claim
+    return {"id": job["id"], "attempts": job["attempts"], "status": "running"}
+
+async def finish_job(job: dict, status: str, **fields):
+    now = datetime.utcnow()
+    await db.jobs.update_one(_claimed(job), {"$set": {
+        "status": status, "lease_until": None, "updated_at": now, "finished_at": now,
+        "expires_at": now + timedelta(seconds=JOB_RETENTION_SECONDS), **fields,
+    }})
+
+async def renew_job_lease(job: dict):
+    while True:
+        await asyncio.sleep(JOB_LEASE_SECONDS / 3)
+        now = datetime.utcnow()
+        await db.jobs.update_one(_claimed(job), {"$set": {"lease_until": now + timedelta(seconds=JOB_LEASE_SECONDS)}})
+
+async def run_job(job: dict):
+    if job["attempts"] > job["max_attempts"]:
+        # Taken over from a worker that died on the last attempt
+        await finish_job(job, "failed", error="Worker stopped while running the final attempt")
+        return
+    
+    lease = asyncio.create_task(renew_job_lease(job))
+    try:
+        result = await JOB_HANDLERS[job["type"]](job)
+    except Exception as exc:
+        logger.exception(f"Job {job['id']} ({job['type']}) failed on attempt {job['attempts']}")
+        error = f"{type(exc).__name__}: {exc}"
+        if job["attempts"] < job["max_attempts"]:
+            delay = JOB_RETRY_BACKOFF_SECONDS * 2 ** (job["attempts"] - 1)
+            await db.jobs.update_one(_claimed(job), {"$set": {
+                "status": "queued", "error": error, "lease_until": None, "updated_at": datetime.utcnow(),
+                "run_after": datetime.utcnow() + timedelta(seconds=delay),
+            }})
+        else:
+            await finish_job(job, "failed", error=error)
+    else:
+        await finish_job(job, "succeeded", progress=1.0, result=result, error=None)
+    finally:
+        lease.cancel()
+
+async def run_job_worker():
+    while True:
+        try:
+            # Check capacity and claim under one lock, so workers never overshoot a type's limit
+            async with _job_claim_lock:
+                free_types = [job_type for job_type in JOB_HANDLERS
+                              if _running_jobs.get(job_type, 0) < JOB_CONCURRENCY.get(job_type, JOB_DEFAULT_CONCURRENCY)]
+                job = await claim_job(free_types) if free_types else None
+                if job:
+                    _running_jobs[job["type"]] = _running_jobs.get(job["type"], 0) + 1
+            if job is None:
+                await asyncio.sleep(JOB_POLL_INTERVAL_SECONDS)
+                continue
+            try:
+                await run_job(job)
+            finally:
+                _running_jobs[job["type"]] -= 1
+        except Exception:
+            logger.exception("Job worker failed")
+            await asyncio.sleep(JOB_POLL_INTERVAL_SECONDS)
+
+async def insert_sample_products(supplier_id: str, job_id: Optional[str] = None) -> int:
+    batch_size = 10
+    for start in range(0, len(SAMPLE_PRODUCTS), batch_size):
+        batch = [Product(**sample, supplier_id=supplier_id).dict() for sample in SAMPLE_PRODUCTS[start:start + batch_size]]
+        await db.products.insert_many(batch)
+        await record_price_history([product["id"] for product in batch])
+        await publish_invalidations("product", {
+            product["id"]: encode_sync_token(product["updated_at"], product["id"]) for product in batch
+        })
+        await bump_facet_version()
+        if job_id:
+            await report_job_progress(job_id, (start + len(batch)) / len(SAMPLE_PRODUCTS))
+    return len(SAMPLE_PRODUCTS)
+
+@job_handler("seed_data")
+async def seed_data_job(job: dict) -> dict:
+    return {"inserted": await insert_sample_products(job["owner_id"], job["id"])}
+
+SYNC_EPOCH = datetime(1970, 1, 1)
+# updated_at comes from the writer's clock, so a write can land after others stamped later.
+# Delta sync only hands out changes at least this old, which the slow write has reached by then.
+SYNC_SAFETY_LAG_SECONDS = float(os.environ.get('SYNC_SAFETY_LAG_SECONDS', '5'))
+
+def encode_sync_token(updated_at: datetime, product_id: str) -> str:
+    # Mongo stores datetimes with millisecond precision, so milliseconds round-trip exactly
+    raw = f"{(updated_at - SYNC_EPOCH) // timedelta(milliseconds=1)}:{product_id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+def decode_sync_token(token: str):
+    try:
+        millis, product_id = base64.urlsafe_b64decode(token.encode()).decode().split(":", 1)
+        return SYNC_EPOCH + timedelta(milliseconds=int(millis)), product_id
+    except (ValueError, UnicodeDecodeError, OverflowError):
+        raise HTTPException(status_code=400, detail="Invalid sync token")
+
+async def facet_version() -> str:
+    """Version of what facet counts depend on; stock changes from orders leave it alone."""
+    state = await db.catalog_state.find_one({"_id": "facets"})
+    return str(state["version"]) if state else "0"
+
+async def bump_facet_version():
+    """Record a write facets depend on: a product created, deleted, (de)activated or repriced.
+
+    Called after the write; a failure is logged rather than failing a write that already happened.
+    """
+    try:
+        state = await db.catalog_state.find_one_and_update(
+            {"_id": "facets"}, {"$inc": {"version": 1}}, upsert=True, return_document=ReturnDocument.AFTER,
+        )
+    except PyMongoError:
+        logger.exception("Could not bump the facet version")
+        return
+    await publish_invalidations("facets", {None: str(state["version"])})
+
+# Lower bounds of the price bands reported by /api/products/facets; the last band is open-ended
+PRICE_BAND_BOUNDARIES = [0, 50, 100, 200, 500, 1000]
+FACET_CACHE_SIZE = 256
+# Cached facets are served without a version check for at most this long, so a worker that
+# missed an invalidation event still catches up
+FACET_CACHE_RECHECK_SECONDS = float(os.environ.get('FACET_CACHE_RECHECK_SECONDS', '30'))
+_facet_cache: Dict[tuple, tuple] = {}  # (facets, when their version was last confirmed)
+_facet_cache_version: Optional[str] = None
+_facet_cache_generation = 0  # bumped by every eviction, so results computed across one aren't cached
+
+# Cache invalidation bus. Writers append (entity, id, version) events to the capped
+# cache_invalidations collection, and every process tails it with a tailable await cursor and
+# evicts what its handlers cached for that entity. An id of None means "anything of this entity".
+INVALIDATION_HANDLERS: Dict[str, List[Callable[[Optional[str]], None]]] = {}
+_invalidations_live = False  # the listener is tailing, so bus-driven caches can be trusted
+_invalidation_position: Optional[datetime] = None  # how far the listener has read, kept across restarts
+
+def invalidation_handler(entity: str):
+    def register(func):
+        INVALIDATION_HANDLERS.setdefault(entity, []).append(func)
+        return func
+    return register
+
+def apply_invalidation(entity: str, entity_id: Optional[str]):
+    for handler in INVALIDATION_HANDLERS.get(entity, []):
+        handler(entity_id)
+
+def invalidate_everything():
+    for entity in INVALIDATION_HANDLERS:
+        apply_invalidation(entity, None)
+
+async def publish_invalidations(entity: str, versions: Dict[str, Optional[str]]):
+    """Tell every process, this one included, that these entities changed (id -> new version).
+
+    Called after the write; a failure is logged rather than failing a write that already happened.
+    """
+    if not versions:
+        return
+    # Evict locally right away so this process reads its own writes; the echo from the bus is harmless
+    for entity_id in versions:
+        apply_invalidation(entity, entity_id)
+    if not INVALIDATION_BUS_BYTES:
+        return
+    published_at = datetime.utcnow()
+    try:
+        await db.cache_invalidations.insert_many([
+            {"entity": entity, "id": entity_id, "version": version, "published_at": published_at}
+            for entity_id, version in versions.items()
+        ], ordered=False)
+    except PyMongoError:
+        logger.exception(f"Could not publish invalidations for {len(versions)} {entity} entries")
+
+async def run_invalidation_listener():
+    """Tail cache_invalidations and apply every event, resuming from the last position seen.
+
+    Positions are ObjectId timestamps. They come from each writer's clock, so a resume starts
+    INVALIDATION_RESUME_OVERLAP_SECONDS early and replays a few events; evicting twice is harmless.
+    If events since the last position have already been overwritten, every cache is cleared.
+    """
+    global _invalidations_live, _invalidation_position
+    overlap = timedelta(seconds=INVALIDATION_RESUME_OVERLAP_SECONDS)
+    if _invalidation_position is None:
+        _invalidation_position = datetime.utcnow()  # caches start empty, so nothing older matters
+    while True:
+        try:
+            resume_from = _invalidation_position - overlap
+            oldest = await db.cache_invalidations.find_one({}, {"_id": 1}, sort=[("$natural", 1)])
+            if oldest and oldest["_id"].generation_time.replace(tzinfo=None) > resume_from:
+                invalidate_everything()
+            cursor = db.cache_invalidations.find(
+                {"_id": {"$gt": ObjectId.from_datetime(resume_from)}},
+                cursor_type=CursorType.TAILABLE_AWAIT,
+            )
+            # A tailable cursor on an empty collection dies at once; retry until events arrive
+            while cursor.alive:
+                checked_at = datetime.utcnow()
+                async for event in cursor:
+                    apply_invalidation(event["entity"], event["id"])
+                _invalidations_live = True
+                _invalidation_position = checked_at
+        except asyncio.CancelledError:
+            _invalidations_live = False
+            raise
+        except PyMongoError:
+            logger.exception("Cache invalidation listener lost its cursor; resuming")
+        _invalidations_live = False
+        await asyncio.sleep(INVALIDATION_RETRY_SECONDS)
+
+@invalidation_handler("facets")
+def evict_product_facets(_: Optional[str]):
+    global _facet_cache_generation
+    _facet_cache.clear()
+    _facet_cache_generation += 1
+
+_transactions_supported: Optional[bool] = None
+
+async def supports_transactions() -> bool:
+    """Multi-document transactions need a replica set or a sharded cluster."""
+    global _transactions_supported
+    if _transactions_supported is None:
+        hello = await client.admin.command("hello")
+        _transactions_supported = "setName" in hello or hello.get("msg") == "isdbgrid"
+    return _transactions_supported
+
 async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)):
     credentials_exception = HTTPException(
         status_code=401,
@@ -185,41 +1311,62 @@ async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(s
     return User(**user)
 
 # PDF Generation Functions
-def generate_receipt_pdf(order: Order, vendor_info: VendorInfo, supplier_info: SupplierInfo):
-    buffer = BytesIO()
-    doc = SimpleDocTemplate(buffer, pagesize=A4, rightMargin=72, leftMargin=72, topMargin=72, bottomMargin=18)
-    
-    # Container for 'Flowable' objects
-    story = []
-    
-    # Define styles
-    styles = getSampleStyleSheet()
-    
-    # Header
-    header_style = styles['Heading1']
-    header_style.alignment = TA_CENTER
-    story.append(Paragraph("TAX INVOICE", header_style))
-    story.append(Spacer(1, 12))
-    
-    # Invoice details
-    invoice_data = [
+# Receipt layout templates, built once at import and shared read-only by every render
+RECEIPT_PAGE_SIZE = A4
+RECEIPT_MARGINS = {"left": 72, "right": 72, "top": 72, "bottom": 18}
+_SAMPLE_STYLES = getSampleStyleSheet()
+RECEIPT_HEADER_STYLE = ParagraphStyle('ReceiptHeader', parent=_SAMPLE_STYLES['Heading1'], alignment=TA_CENTER)
+RECEIPT_FOOTER_STYLE = ParagraphStyle('ReceiptFooter', parent=_SAMPLE_STYLES['Normal'], alignment=TA_CENTER)
+RECEIPT_FOOTER_TEXT = "Thank you for your business!"
+
+INVOICE_COL_WIDTHS = (2*inch, 2*inch)
+INFO_COL_WIDTHS = (3*inch, 3*inch)
+ITEMS_COL_WIDTHS = (0.5*inch, 2.5*inch, 1*inch, 1*inch, 1*inch, 1*inch)
+
+INVOICE_TABLE_STYLE = TableStyle((
+    ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+    ('FONTNAME', (0, 0), (-1, -1), 'Helvetica'),
+    ('FONTSIZE', (0, 0), (-1, -1), 10),
+    ('BOTTOMPADDING', (0, 0), (-1, -1), 6),
+))
+INFO_TABLE_STYLE = TableStyle((
+    ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+    ('FONTNAME', (0, 0), (1, 0), 'Helvetica-Bold'),
+    ('FONTSIZE', (0, 0), (-1, -1), 10),
+    ('BOTTOMPADDING', (0, 0), (-1, -1), 6),
+    ('GRID', (0, 0), (-1, -1), 1, colors.black),
+    ('BACKGROUND', (0, 0), (-1, 0), colors.lightgrey),
+))
+ITEMS_TABLE_STYLE = TableStyle((
+    ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+    ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+    ('FONTSIZE', (0, 0), (-1, -1), 10),
+    ('BOTTOMPADDING', (0, 0), (-1, -1), 6),
+    ('GRID', (0, 0), (-1, -2), 1, colors.black),
+    ('BACKGROUND', (0, 0), (-1, 0), colors.lightgrey),
+    ('ALIGN', (1, 1), (1, -1), 'LEFT'),
+    ('ALIGN', (4, -3), (-1, -1), 'RIGHT'),
+    ('FONTNAME', (4, -1), (-1, -1), 'Helvetica-Bold'),
+    ('BACKGROUND', (4, -1), (-1, -1), colors.lightgrey),
+))
+
+# Geometry of the platypus layout above, reproduced by the direct-canvas renderer
+RECEIPT_ROW_HEIGHT = 21  # 12pt leading + 3pt top padding + 6pt bottom padding
+RECEIPT_CELL_PADDING = 6
+RECEIPT_FRAME_PADDING = 6  # SimpleDocTemplate's frame padding inside the page margins
+RECEIPT_SPACER = 12
+RECEIPT_HEADER_HEIGHT = RECEIPT_HEADER_STYLE.leading + RECEIPT_HEADER_STYLE.spaceAfter
+RECEIPT_FOOTER_HEIGHT = RECEIPT_FOOTER_STYLE.leading
+
+def receipt_invoice_rows(order: Order):
+    return [
         ['Invoice No:', order.id[:8].upper()],
         ['Date:', order.created_at.strftime('%d/%m/%Y')],
         ['Status:', order.status.upper()]
     ]
-    
-    invoice_table = Table(invoice_data, colWidths=[2*inch, 2*inch])
-    invoice_table.setStyle(TableStyle([
-        ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-        ('FONTNAME', (0, 0), (-1, -1), 'Helvetica'),
-        ('FONTSIZE', (0, 0), (-1, -1), 10),
-        ('BOTTOMPADDING', (0, 0), (-1, -1), 6),
-    ]))
-    story.append(invoice_table)
-    story.append(Spacer(1, 12))
-    
-    # Supplier and Vendor info
-    info_data = [
+
+def receipt_info_rows(vendor_info: VendorInfo, supplier_info: SupplierInfo):
+    return [
         ['SUPPLIER DETAILS', 'VENDOR DETAILS'],
         [supplier_info.name, vendor_info.name],
         [supplier_info.address, vendor_info.address],
@@ -227,24 +1374,11 @@ def generate_receipt_pdf(order: Order, vendor_info: VendorInfo, supplier_info: S
         [f'Email: {supplier_info.email}', f'Email: {vendor_info.email}'],
         [f'GST: {supplier_info.gst_number or "N/A"}', f'Business: {vendor_info.business_name or "N/A"}']
     ]
-    
-    info_table = Table(info_data, colWidths=[3*inch, 3*inch])
-    info_table.setStyle(TableStyle([
-        ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-        ('FONTNAME', (0, 0), (1, 0), 'Helvetica-Bold'),
-        ('FONTSIZE', (0, 0), (-1, -1), 10),
-        ('BOTTOMPADDING', (0, 0), (-1, -1), 6),
-        ('GRID', (0, 0), (-1, -1), 1, colors.black),
-        ('BACKGROUND', (0, 0), (-1, 0), colors.lightgrey),
-    ]))
-    story.append(info_table)
-    story.append(Spacer(1, 12))
-    
-    # Items table
-    items_data = [['S.No', 'Product Name', 'Quantity', 'Unit', 'Rate', 'Amount']]
-    
+
+def receipt_item_rows(order: Order):
+    rows = [['S.No', 'Product Name', 'Quantity', 'Unit', 'Rate', 'Amount']]
     for i, item in enumerate(order.items, 1):
-        items_data.append([
+        rows.append([
             str(i),
             item.product_name,
             str(item.quantity),
@@ -252,39 +1386,377 @@ def generate_receipt_pdf(order: Order, vendor_info: VendorInfo, supplier_info: S
             f'₹{item.price:.2f}',
             f'₹{item.total:.2f}'
         ])
+    rows.append(['', '', '', '', 'Subtotal:', f'₹{order.subtotal:.2f}'])
+    rows.append(['', '', '', '', 'Tax (18%):', f'₹{order.tax:.2f}'])
+    rows.append(['', '', '', '', 'TOTAL:', f'₹{order.total:.2f}'])
+    return rows
+
+def _receipt_frame():
+    """Usable frame as (left, width, top, bottom) in page coordinates."""
+    width, height = RECEIPT_PAGE_SIZE
+    left = RECEIPT_MARGINS["left"] + RECEIPT_FRAME_PADDING
+    frame_width = width - left - RECEIPT_MARGINS["right"] - RECEIPT_FRAME_PADDING
+    top = height - RECEIPT_MARGINS["top"] - RECEIPT_FRAME_PADDING
+    return left, frame_width, top, RECEIPT_MARGINS["bottom"] + RECEIPT_FRAME_PADDING
+
+def _draw_table(c, top, col_widths, rows, header=False, grid_rows=None, bold_cells=(),
+                shaded_cells=(), align=None):
+    """Draw a simple table whose top edge is at `top`, centred in the frame like platypus.
+
+    `align` maps (row, col) to 'LEFT', 'CENTER' or 'RIGHT'; cells default to LEFT.
+    `grid_rows` is the number of leading rows that get a grid (all rows when None).
+    Returns the y coordinate of the table's bottom edge.
+    """
+    left, frame_width, _, _ = _receipt_frame()
+    table_width = sum(col_widths)
+    x0 = left + (frame_width - table_width) / 2
+    col_x = [x0]
+    for w in col_widths:
+        col_x.append(col_x[-1] + w)
+    row_count = len(rows)
+    bottom = top - row_count * RECEIPT_ROW_HEIGHT
+
+    c.setFillColor(colors.lightgrey)
+    for row, col in shaded_cells:
+        c.rect(col_x[col], top - (row + 1) * RECEIPT_ROW_HEIGHT, col_widths[col], RECEIPT_ROW_HEIGHT,
+               stroke=0, fill=1)
+    c.setFillColor(colors.black)
+
+    gridded = row_count if grid_rows is None else grid_rows
+    if gridded:
+        c.setLineWidth(1)
+        grid_bottom = top - gridded * RECEIPT_ROW_HEIGHT
+        for i in range(gridded + 1):
+            y = top - i * RECEIPT_ROW_HEIGHT
+            c.line(col_x[0], y, col_x[-1], y)
+        for x in col_x:
+            c.line(x, top, x, grid_bottom)
+
+    align = align or {}
+    for r, row in enumerate(rows):
+        baseline = top - (r + 1) * RECEIPT_ROW_HEIGHT + RECEIPT_CELL_PADDING + 2
+        for col, text in enumerate(row):
+            if not text:
+                continue
+            c.setFont('Helvetica-Bold' if (header and r == 0) or (r, col) in bold_cells else 'Helvetica', 10)
+            cell_align = align.get((r, col), 'LEFT')
+            if cell_align == 'CENTER':
+                c.drawCentredString((col_x[col] + col_x[col + 1]) / 2, baseline, text)
+            elif cell_align == 'RIGHT':
+                c.drawRightString(col_x[col + 1] - RECEIPT_CELL_PADDING, baseline, text)
+            else:
+                c.drawString(col_x[col] + RECEIPT_CELL_PADDING, baseline, text)
+    return bottom
+
+def draw_document_header(c, title: str, detail_rows, vendor_info: VendorInfo, supplier_info: SupplierInfo,
+                         top: float):
+    """Draw the title, document details and supplier/vendor block; returns the y below it."""
+    left, frame_width, _, _ = _receipt_frame()
+    c.setFont(RECEIPT_HEADER_STYLE.fontName, RECEIPT_HEADER_STYLE.fontSize)
+    c.drawCentredString(left + frame_width / 2, top - RECEIPT_HEADER_STYLE.fontSize, title)
+    y = top - RECEIPT_HEADER_HEIGHT - RECEIPT_SPACER
+    y = _draw_table(c, y, INVOICE_COL_WIDTHS, detail_rows, grid_rows=0) - RECEIPT_SPACER
+    info_rows = receipt_info_rows(vendor_info, supplier_info)
+    return _draw_table(c, y, INFO_COL_WIDTHS, info_rows, header=True,
+                       shaded_cells=[(0, 0), (0, 1)]) - RECEIPT_SPACER
+
+def draw_receipt_header(c, order: Order, vendor_info: VendorInfo, supplier_info: SupplierInfo, top: float):
+    return draw_document_header(c, "TAX INVOICE", receipt_invoice_rows(order), vendor_info, supplier_info, top)
+
+def _receipt_fits_one_page(order: Order):
+    _, _, top, bottom = _receipt_frame()
+    rows = 3 + 6 + len(order.items) + 4
+    height = (RECEIPT_HEADER_HEIGHT + rows * RECEIPT_ROW_HEIGHT + 4 * RECEIPT_SPACER
+              + RECEIPT_FOOTER_HEIGHT)
+    return height <= top - bottom
+
+def render_receipt_fast(order: Order, vendor_info: VendorInfo, supplier_info: SupplierInfo):
+    """Draw a single-page receipt directly on a canvas, skipping platypus layout."""
+    buffer = BytesIO()
+    c = canvas.Canvas(buffer, pagesize=RECEIPT_PAGE_SIZE)
+    left, frame_width, top, _ = _receipt_frame()
+
+    y = draw_receipt_header(c, order, vendor_info, supplier_info, top)
+
+    rows = receipt_item_rows(order)
+    last = len(rows) - 1
+    align = {}
+    for r in range(len(rows)):
+        for col in range(len(ITEMS_COL_WIDTHS)):
+            align[(r, col)] = 'CENTER'
+        if r:
+            align[(r, 1)] = 'LEFT'
+        if r >= last - 2:
+            align[(r, 4)] = align[(r, 5)] = 'RIGHT'
+    shaded = [(0, col) for col in range(len(ITEMS_COL_WIDTHS))] + [(last, 4), (last, 5)]
+    y = _draw_table(c, y, ITEMS_COL_WIDTHS, rows, header=True, grid_rows=last,
+                    bold_cells={(last, 4), (last, 5)}, shaded_cells=shaded, align=align) - RECEIPT_SPACER
+
+    c.setFont(RECEIPT_FOOTER_STYLE.fontName, RECEIPT_FOOTER_STYLE.fontSize)
+    c.drawCentredString(left + frame_width / 2, y - RECEIPT_FOOTER_STYLE.fontSize, RECEIPT_FOOTER_TEXT)
+
+    c.showPage()
+    c.save()
+    buffer.seek(0)
+    return buffer
+
+def render_receipt_platypus(order: Order, vendor_info: VendorInfo, supplier_info: SupplierInfo):
+    """Full platypus layout, used for receipts that need more than one page."""
+    buffer = BytesIO()
+    doc = SimpleDocTemplate(buffer, pagesize=RECEIPT_PAGE_SIZE, rightMargin=RECEIPT_MARGINS["right"],
+                            leftMargin=RECEIPT_MARGINS["left"], topMargin=RECEIPT_MARGINS["top"],
+                            bottomMargin=RECEIPT_MARGINS["bottom"])
+    
+    # Container for 'Flowable' objects
+    story = []
+    
+    # Header
+    story.append(Paragraph("TAX INVOICE", RECEIPT_HEADER_STYLE))
+    story.append(Spacer(1, RECEIPT_SPACER))
+    
+    # Invoice details
+    invoice_table = Table(receipt_invoice_rows(order), colWidths=INVOICE_COL_WIDTHS)
+    invoice_table.setStyle(INVOICE_TABLE_STYLE)
+    story.append(invoice_table)
+    story.append(Spacer(1, RECEIPT_SPACER))
+    
+    # Supplier and Vendor info
+    info_table = Table(receipt_info_rows(vendor_info, supplier_info), colWidths=INFO_COL_WIDTHS)
+    info_table.setStyle(INFO_TABLE_STYLE)
+    story.append(info_table)
+    story.append(Spacer(1, RECEIPT_SPACER))
     
-    # Add subtotal, tax, and total
-    items_data.append(['', '', '', '', 'Subtotal:', f'₹{order.subtotal:.2f}'])
-    items_data.append(['', '', '', '', 'Tax (18%):', f'₹{order.tax:.2f}'])
-    items_data.append(['', '', '', '', 'TOTAL:', f'₹{order.total:.2f}'])
-    
-    items_table = Table(items_data, colWidths=[0.5*inch, 2.5*inch, 1*inch, 1*inch, 1*inch, 1*inch])
-    items_table.setStyle(TableStyle([
-        ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-        ('FONTSIZE', (0, 0), (-1, -1), 10),
-        ('BOTTOMPADDING', (0, 0), (-1, -1), 6),
-        ('GRID', (0, 0), (-1, -2), 1, colors.black),
-        ('BACKGROUND', (0, 0), (-1, 0), colors.lightgrey),
-        ('ALIGN', (1, 1), (1, -1), 'LEFT'),
-        ('ALIGN', (4, -3), (-1, -1), 'RIGHT'),
-        ('FONTNAME', (4, -1), (-1, -1), 'Helvetica-Bold'),
-        ('BACKGROUND', (4, -1), (-1, -1), colors.lightgrey),
-    ]))
+    # Items table with subtotal, tax, and total
+    items_table = Table(receipt_item_rows(order), colWidths=ITEMS_COL_WIDTHS, repeatRows=1)
+    items_table.setStyle(ITEMS_TABLE_STYLE)
     story.append(items_table)
-    story.append(Spacer(1, 12))
+    story.append(Spacer(1, RECEIPT_SPACER))
     
     # Footer
-    footer_text = "Thank you for your business!"
-    footer_style = styles['Normal']
-    footer_style.alignment = TA_CENTER
-    story.append(Paragraph(footer_text, footer_style))
+    story.append(Paragraph(RECEIPT_FOOTER_TEXT, RECEIPT_FOOTER_STYLE))
     
     # Build PDF
     doc.build(story)
     buffer.seek(0)
     return buffer
 
+def generate_receipt_pdf(order: Order, vendor_info: VendorInfo, supplier_info: SupplierInfo):
+    if _receipt_fits_one_page(order):
+        return render_receipt_fast(order, vendor_info, supplier_info)
+    return render_receipt_platypus(order, vendor_info, supplier_info)
+
+# Monthly statements: one line per order, drawn onto the receipt page layout as orders stream in
+STATEMENT_COLUMNS = ['S.No', 'Date', 'Invoice No', 'Status', 'Items', 'Amount']
+STATEMENT_COL_WIDTHS = (0.5*inch, 1.25*inch, 1.25*inch, 1.25*inch, 0.75*inch, 2*inch)
+STATEMENT_ROW_ALIGN = {**{(0, col): 'CENTER' for col in range(5)}, (0, 5): 'RIGHT'}
+STATEMENT_BATCH_SIZE = 500  # orders fetched per cursor round trip
+# Statements with more orders than this are built by a "statement" job into the statements
+# GridFS bucket, instead of being held in memory by a request
+STATEMENT_SYNC_MAX_ORDERS = int(os.environ.get('STATEMENT_SYNC_MAX_ORDERS', '2000'))
+
+def statement_order_row(index: int, order: dict):
+    return [
+        str(index),
+        order['created_at'].strftime('%d/%m/%Y'),
+        order['id'][:8].upper(),
+        order['status'].upper(),
+        str(order['item_count']),
+        f'₹{order["total"]:.2f}'
+    ]
+
+def _draw_statement_columns(c, top: float):
+    shaded = [(0, col) for col in range(len(STATEMENT_COL_WIDTHS))]
+    return _draw_table(c, top, STATEMENT_COL_WIDTHS, [STATEMENT_COLUMNS], header=True, shaded_cells=shaded,
+                       align={(0, col): 'CENTER' for col in range(len(STATEMENT_COL_WIDTHS))})
+
+def _draw_page_number(c, page: int):
+    left, frame_width, _, _ = _receipt_frame()
+    c.setFont('Helvetica', 9)
+    c.drawCentredString(left + frame_width / 2, RECEIPT_MARGINS["bottom"] / 2, f"Page {page}")
+
+class StatementCanvas:
+    """A statement PDF drawn onto the receipt page layout, a batch of order rows at a time.
+
+    The methods are synchronous so render_statement_pdf can run them in a worker thread.
+    """
+
+    def __init__(self, out, detail_rows, vendor_info: VendorInfo, supplier_info: SupplierInfo):
+        self.c = canvas.Canvas(out, pagesize=RECEIPT_PAGE_SIZE, pageCompression=1)
+        self.left, self.frame_width, self.top, self.bottom = _receipt_frame()
+        self.page = 1
+        self.count, self.subtotal, self.tax, self.total = 0, 0.0, 0.0, 0.0
+        y = draw_document_header(self.c, "STATEMENT OF ACCOUNT", detail_rows, vendor_info, supplier_info, self.top)
+        self.y = _draw_statement_columns(self.c, y)
+
+    def new_page(self):
+        _draw_page_number(self.c, self.page)
+        self.c.showPage()
+        self.page += 1
+
+    def draw_orders(self, orders: List[dict]):
+        for order in orders:
+            if self.y - RECEIPT_ROW_HEIGHT < self.bottom:
+                self.new_page()
+                self.y = _draw_statement_columns(self.c, self.top)
+            self.count += 1
+            self.y = _draw_table(self.c, self.y, STATEMENT_COL_WIDTHS, [statement_order_row(self.count, order)],
+                                 align=STATEMENT_ROW_ALIGN)
+            # Cancelled orders are listed but not billed
+            if order['status'] != 'cancelled':
+                self.subtotal += order['subtotal']
+                self.tax += order['tax']
+                self.total += order['total']
+
+    def finish(self):
+        c, y = self.c, self.y
+        totals = [
+            ['', '', '', '', 'Orders:', str(self.count)],
+            ['', '', '', '', 'Subtotal:', f'₹{self.subtotal:.2f}'],
+            ['', '', '', '', 'Tax (18%):', f'₹{self.tax:.2f}'],
+            ['', '', '', '', 'TOTAL DUE:', f'₹{self.total:.2f}'],
+        ]
+        last = len(totals) - 1
+        if y - RECEIPT_SPACER - len(totals) * RECEIPT_ROW_HEIGHT - RECEIPT_SPACER - RECEIPT_FOOTER_HEIGHT < self.bottom:
+            self.new_page()
+            y = self.top + RECEIPT_SPACER
+        align = {(r, col): 'RIGHT' for r in range(len(totals)) for col in (4, 5)}
+        y = _draw_table(c, y - RECEIPT_SPACER, STATEMENT_COL_WIDTHS, totals, grid_rows=0,
+                        bold_cells={(last, 4), (last, 5)}, shaded_cells=[(last, 4), (last, 5)],
+                        align=align) - RECEIPT_SPACER
+        c.setFont(RECEIPT_FOOTER_STYLE.fontName, RECEIPT_FOOTER_STYLE.fontSize)
+        c.drawCentredString(self.left + self.frame_width / 2, y - RECEIPT_FOOTER_STYLE.fontSize, RECEIPT_FOOTER_TEXT)
+        _draw_page_number(c, self.page)
+        c.showPage()
+        c.save()
+
+async def render_statement_pdf(out, orders, detail_rows, vendor_info: VendorInfo, supplier_info: SupplierInfo):
+    """Draw a statement into `out` from an async iterable of order summaries.
+
+    Each cursor batch is drawn in a worker thread, so the event loop only fetches. ReportLab
+    keeps every finished page until save() and can't emit a page earlier, so memory grows
+    with the page count: statements above STATEMENT_SYNC_MAX_ORDERS are left to a job.
+    """
+    statement = await asyncio.to_thread(StatementCanvas, out, detail_rows, vendor_info, supplier_info)
+    batch = []
+    async for order in orders:
+        batch.append(order)
+        if len(batch) == STATEMENT_BATCH_SIZE:
+            await asyncio.to_thread(statement.draw_orders, batch)
+            batch = []
+    await asyncio.to_thread(statement.draw_orders, batch)
+    await asyncio.to_thread(statement.finish)
+
+# Streamed downloads: files that must be finished before they can be sent are spooled first
+SPOOL_MAX_BYTES = 1024 * 1024  # spooled files larger than this spill to a temporary file
+STREAM_CHUNK_SIZE = 64 * 1024
+
+def iter_spooled(spool):
+    """Yield a spooled file from the start in chunks, closing it once sent."""
+    spool.seek(0)
+    with spool:
+        while chunk := spool.read(STREAM_CHUNK_SIZE):
+            yield chunk
+
+# Exports: rows come from an aggregation cursor and are written EXPORT_BATCH_SIZE at a time.
+# Columns are (name, Arrow type alias) so Parquet files keep the same schema in every batch.
+EXPORT_BATCH_SIZE = 1000
+ORDER_EXPORT_COLUMNS = [
+    ("order_id", "string"), ("created_at", "timestamp[ms]"), ("status", "string"),
+    ("vendor_id", "string"), ("supplier_id", "string"), ("product_id", "string"),
+    ("product_name", "string"), ("quantity", "int64"), ("unit", "string"), ("price", "double"),
+    ("line_total", "double"), ("order_subtotal", "double"), ("order_tax", "double"), ("order_total", "double"),
+]
+ANALYTICS_EXPORT_COLUMNS = [
+    ("date", "string"), ("orders", "int64"), ("subtotal", "double"), ("tax", "double"), ("total", "double"),
+]
+EXPORT_MEDIA_TYPES = {"csv": "text/csv", "parquet": "application/vnd.apache.parquet"}
+
+async def export_batches(cursor):
+    batch = []
+    async for row in cursor:
+        batch.append(row)
+        if len(batch) == EXPORT_BATCH_SIZE:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+async def stream_csv(cursor, columns):
+    names = [name for name, _ in columns]
+    buffer = StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=names, extrasaction='ignore')
+    writer.writeheader()
+    async for batch in export_batches(cursor):
+        writer.writerows(batch)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    yield buffer.getvalue()
+
+async def write_parquet(out, cursor, columns):
+    """Write cursor rows to `out` as Parquet, one row group per batch."""
+    try:
+        import pandas as pd
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise HTTPException(status_code=501, detail="Parquet export needs pandas and pyarrow installed")
+    
+    schema = pa.schema([(name, pa.type_for_alias(alias)) for name, alias in columns])
+    with pq.ParquetWriter(out, schema) as writer:
+        async for batch in export_batches(cursor):
+            frame = pd.DataFrame.from_records(batch, columns=schema.names)
+            writer.write_table(pa.Table.from_pandas(frame, schema=schema, preserve_index=False))
+
+async def export_response(cursor, columns, file_format: str, filename: str):
+    headers = {"Content-Disposition": f"attachment; filename={filename}.{file_format}"}
+    if file_format == "csv":
+        return StreamingResponse(stream_csv(cursor, columns), media_type=EXPORT_MEDIA_TYPES["csv"], headers=headers)
+    
+    # The Parquet footer is written last, so the file is spooled before it is sent
+    spool = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_BYTES)
+    try:
+        await write_parquet(spool, cursor, columns)
+    except BaseException:
+        spool.close()
+        raise
+    return StreamingResponse(iter_spooled(spool), media_type=EXPORT_MEDIA_TYPES[file_format], headers=headers)
+
+def export_match(current_user: User, start: Optional[datetime], end: Optional[datetime]) -> dict:
+    query = {f"{current_user.user_type}_id": current_user.id}
+    if start or end:
+        query["created_at"] = {}
+        if start:
+            query["created_at"]["$gte"] = start
+        if end:
+            query["created_at"]["$lt"] = end
+    return {"$match": query}
+
+# Demand forecasting: order history becomes one product-by-day quantity matrix and every
+# product is smoothed in a single matrix operation instead of a loop per product
+def demand_matrix(np, product_ids: List[str], rows: List[dict], start: datetime, days: int):
+    """Units sold per product (rows) and day (columns); days without orders stay zero."""
+    matrix = np.zeros((len(product_ids), days))
+    index = {product_id: i for i, product_id in enumerate(product_ids)}
+    rows = [row for row in rows if row["_id"]["product_id"] in index]
+    if rows:
+        product_rows = np.fromiter((index[row["_id"]["product_id"]] for row in rows), dtype=np.intp, count=len(rows))
+        dates = np.array([row["_id"]["day"] for row in rows], dtype="datetime64[D]")
+        day_columns = (dates - np.datetime64(start.date(), "D")).astype(np.intp)
+        quantities = np.fromiter((row["quantity"] for row in rows), dtype=float, count=len(rows))
+        np.add.at(matrix, (product_rows, day_columns), quantities)
+    return matrix
+
+def smoothed_demand(np, matrix, method: str, alpha: float, window: int):
+    """Next-day demand per product. Exponential smoothing is applied as one matrix-vector
+    product using the closed form of s_t = alpha * x_t + (1 - alpha) * s_(t-1), s_0 = x_0."""
+    days = matrix.shape[1]
+    if method == "moving_average":
+        return matrix[:, -min(window, days):].mean(axis=1)
+    weights = alpha * (1 - alpha) ** np.arange(days - 1, -1, -1, dtype=float)
+    weights[0] = (1 - alpha) ** (days - 1)
+    return matrix @ weights
+
 # Authentication routes
 @api_router.post("/register", response_model=UserResponse)
 async def register(user: UserCreate):
@@ -301,6 +1773,9 @@ async def register(user: UserCreate):
     user_obj = User(**user_dict)
     user_doc = user_obj.dict()
     user_doc['password'] = hashed_password
+    if user_doc['location'] is None:
+        # Leave the field out so the 2dsphere index only holds located users
+        user_doc.pop('location')
     print(f"[DEBUG] User doc to insert: {user_doc}")
     await db.users.insert_one(user_doc)
     return UserResponse(**user_obj.dict())
@@ -342,35 +1817,369 @@ async def create_product(product: ProductCreate, current_user: User = Depends(ge
     product_obj = Product(**product_dict)
     
     await db.products.insert_one(product_obj.dict())
+    await record_price_history([product_obj.id])
+    await publish_invalidations("product", {product_obj.id: encode_sync_token(product_obj.updated_at, product_obj.id)})
+    await bump_facet_version()
     return product_obj
 
 @api_router.get("/products", response_model=List[Product])
-async def get_products(category: Optional[str] = None):
+async def get_products(category: Optional[str] = None, supplier_id: Optional[str] = None):
     query = {"is_active": True}
     if category:
         query["category"] = category
-    products = await db.products.find(query).to_list(1000)
+    if supplier_id:
+        query["supplier_id"] = supplier_id
+    products = await catalog_db.products.find(query).to_list(1000)
     return [Product(**product) for product in products]
 
+# Downsampling periods for /api/products/history, with their length for the bucket-count guard
+PRICE_HISTORY_INTERVALS = {"hour": timedelta(hours=1), "day": timedelta(days=1),
+                           "week": timedelta(weeks=1), "month": timedelta(days=31)}
+PRICE_HISTORY_MAX_BUCKETS = 1000
+PRICE_HISTORY_MAX_PRODUCTS = 50
+
+def naive_utc(value: Optional[datetime]) -> Optional[datetime]:
+    """Timestamps are stored as naive UTC; query parameters may carry an offset."""
+    if value is None or value.tzinfo is None:
+        return value
+    return value.astimezone(timezone.utc).replace(tzinfo=None)
+
+@api_router.get("/products/history", response_model=List[ProductPriceHistory])
+async def get_price_history(product_ids: str = Query(..., description="Comma separated product ids"),
+                            start: Optional[datetime] = None, end: Optional[datetime] = None,
+                            interval: Literal["hour", "day", "week", "month"] = "day",
+                            current_user: User = Depends(get_current_user)):
+    """Price and stock per period for one or more products, downsampled on the server"""
+    ids = list(dict.fromkeys(product_id.strip() for product_id in product_ids.split(",") if product_id.strip()))
+    if not ids or len(ids) > PRICE_HISTORY_MAX_PRODUCTS:
+        raise HTTPException(status_code=400, detail=f"Give between 1 and {PRICE_HISTORY_MAX_PRODUCTS} product ids")
+    end = naive_utc(end) or datetime.utcnow()
+    start = naive_utc(start) or end - timedelta(days=30)
+    if start >= end:
+        raise HTTPException(status_code=400, detail="start must be before end")
+    if (end - start) / PRICE_HISTORY_INTERVALS[interval] > PRICE_HISTORY_MAX_BUCKETS:
+        raise HTTPException(status_code=400, detail=f"Range covers more than {PRICE_HISTORY_MAX_BUCKETS} {interval}s; "
+                                                    "use a longer interval")
+    
+    pipeline = [
+        {"$match": {"product_id": {"$in": ids}, "recorded_at": {"$gte": start, "$lt": end}}},
+        {"$sort": {"recorded_at": 1}},
+        {"$group": {
+            "_id": {"product_id": "$product_id",
+                    "period_start": {"$dateTrunc": {"date": "$recorded_at", "unit": interval}}},
+            "price_open": {"$first": "$price"},
+            "price_close": {"$last": "$price"},
+            "price_min": {"$min": "$price"},
+            "price_max": {"$max": "$price"},
+            "stock_close": {"$last": "$stock_quantity"},
+            "stock_min": {"$min": "$stock_quantity"},
+            "samples": {"$sum": 1},
+        }},
+        # Period-over-period change; $shift yields null for each product's first period
+        {"$setWindowFields": {
+            "partitionBy": "$_id.product_id",
+            "sortBy": {"_id.period_start": 1},
+            "output": {"previous_close": {"$shift": {"output": "$price_close", "by": -1}}},
+        }},
+        {"$set": {"price_change": {"$subtract": ["$price_close", "$previous_close"]}}},
+        {"$sort": {"_id.product_id": 1, "_id.period_start": 1}},
+    ]
+    points = {product_id: [] for product_id in ids}
+    async for row in analytics_db.product_price_history.aggregate(pipeline):
+        key = row.pop("_id")
+        points[key["product_id"]].append(PriceHistoryPoint(period_start=key["period_start"], **row))
+    return [ProductPriceHistory(product_id=product_id, interval=interval, points=points[product_id])
+            for product_id in ids]
+
+@api_router.get("/products/changes", response_model=ProductChanges)
+async def get_product_changes(since: Optional[str] = None, limit: int = Query(500, ge=1, le=1000)):
+    """Catalog changes after a sync token, oldest first; omit `since` for a full sync"""
+    # Reads from the primary: a lagging secondary could hand out a token past writes it hasn't seen
+    query = {"updated_at": {"$lte": datetime.utcnow() - timedelta(seconds=SYNC_SAFETY_LAG_SECONDS)}}
+    if since:
+        updated_at, product_id = decode_sync_token(since)
+        query["$or"] = [
+            {"updated_at": {"$gt": updated_at}},
+            {"updated_at": updated_at, "id": {"$gt": product_id}},
+        ]
+    products = await db.products.find(query).sort([("updated_at", 1), ("id", 1)]).limit(limit + 1).to_list(limit + 1)
+    has_more = len(products) > limit
+    products = products[:limit]
+    
+    if products:
+        token = encode_sync_token(products[-1]["updated_at"], products[-1]["id"])
+    else:
+        token = since or encode_sync_token(SYNC_EPOCH, "")
+    return ProductChanges(
+        changes=[Product(**product) for product in products if product.get("is_active", True)],
+        deleted=[product["id"] for product in products if not product.get("is_active", True)],
+        token=token,
+        has_more=has_more,
+    )
+
+@api_router.get("/products/facets", response_model=ProductFacets)
+async def get_product_facets(
+    category: Optional[str] = None,
+    unit: Optional[str] = None,
+    min_price: Optional[float] = None,
+    max_price: Optional[float] = None,
+):
+    """Category, unit and price-band counts for the active catalog.
+
+    Each facet is filtered by the other facets' selections but not its own, so the
+    client can show alternatives next to the current choice.
+    """
+    global _facet_cache_version
+    cache_key = (category, unit, min_price, max_price)
+    now = datetime.utcnow()
+    cached = _facet_cache.get(cache_key)
+    if _invalidations_live and cached and now - cached[1] < timedelta(seconds=FACET_CACHE_RECHECK_SECONDS):
+        # Catalog writes from every process evict this cache through the invalidation bus
+        return cached[0]
+    generation = _facet_cache_generation
+    # Cached counts are read from the primary: a lagging secondary's would outlive the
+    # eviction that triggered the recompute
+    version = await facet_version()
+    if version != _facet_cache_version:
+        _facet_cache.clear()
+        _facet_cache_version = version
+    if cache_key in _facet_cache:
+        facets = _facet_cache[cache_key][0]
+        _facet_cache[cache_key] = (facets, now)
+        return facets
+    
+    selections = {}
+    if category:
+        selections["category"] = {"category": category}
+    if unit:
+        selections["unit"] = {"unit": unit}
+    price = {}
+    if min_price is not None:
+        price["$gte"] = min_price
+    if max_price is not None:
+        price["$lte"] = max_price
+    if price:
+        selections["price"] = {"price": price}
+    
+    def match_except(dimension=None):
+        conditions = [condition for name, condition in selections.items() if name != dimension]
+        return [{"$match": {"$and": conditions}}] if conditions else []
+    
+    def count_by(field):
+        return [{"$group": {"_id": f"${field}", "count": {"$sum": 1}}}, {"$sort": {"count": -1, "_id": 1}}]
+    
+    pipeline = [
+        {"$match": {"is_active": True}},
+        {"$facet": {
+            "categories": match_except("category") + count_by("category"),
+            "units": match_except("unit") + count_by("unit"),
+            "price_bands": match_except("price") + [{"$bucket": {
+                "groupBy": "$price",
+                "boundaries": PRICE_BAND_BOUNDARIES,
+                "default": "above",
+                "output": {"count": {"$sum": 1}},
+            }}],
+            "total": match_except() + [{"$count": "count"}],
+        }},
+    ]
+    result = (await db.products.aggregate(pipeline).to_list(1))[0]
+    
+    upper_bounds = dict(zip(PRICE_BAND_BOUNDARIES, PRICE_BAND_BOUNDARIES[1:]))
+    price_bands = []
+    for band in result["price_bands"]:
+        if band["_id"] == "above":
+            price_bands.append(PriceBandCount(min_price=PRICE_BAND_BOUNDARIES[-1], count=band["count"]))
+        else:
+            price_bands.append(PriceBandCount(min_price=band["_id"], max_price=upper_bounds[band["_id"]],
+                                              count=band["count"]))
+    facets = ProductFacets(
+        categories=[FacetCount(value=row["_id"], count=row["count"]) for row in result["categories"]],
+        units=[FacetCount(value=row["_id"], count=row["count"]) for row in result["units"]],
+        price_bands=price_bands,
+        total=result["total"][0]["count"] if result["total"] else 0,
+        version=version,
+    )
+    if generation == _facet_cache_generation:
+        if len(_facet_cache) >= FACET_CACHE_SIZE:
+            _facet_cache.clear()
+        _facet_cache[cache_key] = (facets, now)
+    return facets
+
+@api_router.patch("/products", response_model=BulkProductUpdateResult)
+async def bulk_update_products(bulk: BulkProductUpdate, current_user: User = Depends(get_current_user)):
+    """Set stock, price and availability for many of the supplier's products in one unordered bulk write"""
+    if current_user.user_type != "supplier":
+        raise HTTPException(status_code=403, detail="Only suppliers can update products")
+    
+    failures = []
+    updates = {}
+    for update in bulk.updates:
+        changes = update.dict(exclude={"product_id"}, exclude_none=True)
+        if update.product_id in updates:
+            failures.append(ProductUpdateFailure(product_id=update.product_id, error="Duplicate update for this product"))
+        elif not changes:
+            failures.append(ProductUpdateFailure(product_id=update.product_id, error="No fields to update"))
+        else:
+            updates[update.product_id] = changes
+    
+    # One ownership check for the whole batch; other suppliers' products look missing
+    owned = {
+        product["id"]: product
+        for product in await db.products.find(
+            {"id": {"$in": list(updates)}, "supplier_id": current_user.id},
+            {"_id": 0, "id": 1, "price": 1, "stock_quantity": 1, "is_active": 1},
+        ).to_list(len(updates))
+    }
+    for product_id in [product_id for product_id in updates if product_id not in owned]:
+        failures.append(ProductUpdateFailure(product_id=product_id, error="Product not found"))
+    
+    # Only products that differ are written, so unchanged ones keep their updated_at for catalog sync
+    now = datetime.utcnow()
+    product_ids = [product_id for product_id in updates if product_id in owned]
+    operations = [
+        UpdateOne(
+            {"id": product_id, "supplier_id": current_user.id,
+             "$or": [{field: {"$ne": value}} for field, value in updates[product_id].items()]},
+            {"$set": {**updates[product_id], "updated_at": now}},
+        )
+        for product_id in product_ids
+    ]
+    modified = 0
+    if operations:
+        try:
+            result = await db.products.bulk_write(operations, ordered=False)
+            modified = result.modified_count
+        except BulkWriteError as exc:
+            modified = exc.details.get("nModified", 0)
+            for error in exc.details.get("writeErrors", []):
+                failures.append(ProductUpdateFailure(product_id=product_ids[error["index"]], error=error["errmsg"]))
+    
+    failed = {failure.product_id for failure in failures}
+    if modified:
+        await publish_invalidations("product", {
+            product_id: encode_sync_token(now, product_id) for product_id in product_ids if product_id not in failed
+        })
+        # Stock-only updates leave facet counts as they were
+        if any(field in updates[product_id] and updates[product_id][field] != owned[product_id].get(field, True)
+               for product_id in product_ids if product_id not in failed for field in ("price", "is_active")):
+            await bump_facet_version()
+    await record_price_history([
+        product_id for product_id in product_ids
+        if product_id not in failed and any(
+            field in updates[product_id] and updates[product_id][field] != owned[product_id][field]
+            for field in ("price", "stock_quantity")
+        )
+    ])
+    return BulkProductUpdateResult(matched=len(operations), modified=modified, failures=failures)
+
+@api_router.delete("/products/{product_id}")
+async def delete_product(product_id: str, current_user: User = Depends(get_current_user)):
+    """Soft-delete a product, leaving a tombstone for catalog sync"""
+    if current_user.user_type != "supplier":
+        raise HTTPException(status_code=403, detail="Only suppliers can delete products")
+    
+    now = datetime.utcnow()
+    result = await db.products.update_one(
+        {"id": product_id, "supplier_id": current_user.id},
+        {"$set": {"is_active": False, "updated_at": now}},
+    )
+    if result.matched_count == 0:
+        raise HTTPException(status_code=404, detail="Product not found")
+    await publish_invalidations("product", {product_id: encode_sync_token(now, product_id)})
+    await bump_facet_version()
+    return {"message": "Product deleted"}
+
 @api_router.get("/categories")
 async def get_categories():
-    categories = await db.products.distinct("category", {"is_active": True})
+    categories = await catalog_db.products.distinct("category", {"is_active": True})
     return sorted(categories)
 
 @api_router.get("/suppliers", response_model=List[UserResponse])
 async def get_suppliers():
-    suppliers = await db.users.find({"user_type": "supplier", "is_active": True}).to_list(1000)
+    suppliers = await catalog_db.users.find({"user_type": "supplier", "is_active": True}).to_list(1000)
     return [UserResponse(**{k: v for k, v in supplier.items() if k != 'password'}) for supplier in suppliers]
 
+@api_router.get("/suppliers/nearby", response_model=List[NearbySupplier])
+async def get_nearby_suppliers(
+    lng: float = Query(..., ge=-180, le=180),
+    lat: float = Query(..., ge=-90, le=90),
+    radius_km: float = Query(10.0, gt=0, le=500),
+    limit: int = Query(20, ge=1, le=100),
+    category: Optional[str] = None,
+):
+    """Suppliers closest to a point, nearest first"""
+    query = {"user_type": "supplier", "is_active": True}
+    if category:
+        query["id"] = {"$in": await catalog_db.products.distinct("supplier_id", {"category": category, "is_active": True})}
+    
+    pipeline = [
+        {"$geoNear": {
+            "near": {"type": "Point", "coordinates": [lng, lat]},
+            "key": "location",
+            "distanceField": "distance_m",
+            "maxDistance": radius_km * 1000,
+            "query": query,
+            "spherical": True,
+        }},
+        {"$limit": limit},
+        {"$project": {"_id": 0, "password": 0}},
+    ]
+    suppliers = await catalog_db.users.aggregate(pipeline).to_list(limit)
+    return [NearbySupplier(**supplier, distance_km=round(supplier["distance_m"] / 1000, 3)) for supplier in suppliers]
+
 @api_router.get("/products/category/{category_name}", response_model=List[Product])
 async def get_products_by_category(category_name: str, current_user: User = Depends(get_current_user)):
     """Get products by specific category"""
     if current_user.user_type != "vendor":
         raise HTTPException(status_code=403, detail="Only vendors can browse products by category")
     
-    products = await db.products.find({"category": category_name, "is_active": True}).to_list(1000)
+    products = await catalog_db.products.find({"category": category_name, "is_active": True}).to_list(1000)
     return [Product(**product) for product in products]
 
+BOOTSTRAP_PRODUCTS_LIMIT = 200
+BOOTSTRAP_ORDERS_LIMIT = 50
+
+@api_router.get("/bootstrap", response_model=Union[VendorBootstrap, SupplierBootstrap])
+async def get_bootstrap(current_user: User = Depends(get_current_user)):
+    """Everything a dashboard needs for first paint, queried concurrently in one round trip"""
+    async def first_page(cursor, limit):
+        # One extra document tells the client whether to fetch the rest
+        docs = await cursor.limit(limit + 1).to_list(limit + 1)
+        return docs[:limit], len(docs) > limit
+    
+    if current_user.user_type == "vendor":
+        product_query, counterparty_field = {"is_active": True}, "supplier_id"
+    else:
+        product_query, counterparty_field = {"supplier_id": current_user.id, "is_active": True}, "vendor_id"
+    order_pipeline = orders_with_counterparty_pipeline(
+        {f"{current_user.user_type}_id": current_user.id}, counterparty_field, BOOTSTRAP_ORDERS_LIMIT + 1,
+        sort={"created_at": -1, "id": -1},  # newest first, as /api/orders lists them
+    )
+    
+    lookups = [
+        first_page(catalog_db.products.find(product_query, {"_id": 0}), BOOTSTRAP_PRODUCTS_LIMIT),
+        db.orders.aggregate(order_pipeline).to_list(BOOTSTRAP_ORDERS_LIMIT + 1),
+    ]
+    if current_user.user_type == "vendor":
+        lookups += [
+            catalog_db.products.distinct("category", {"is_active": True}),
+            catalog_db.users.find({"user_type": "supplier", "is_active": True},
+                                  {"_id": 0, "password": 0}).to_list(1000),
+        ]
+    (products, more_products), orders, *vendor_extras = await asyncio.gather(*lookups)
+    
+    payload = {
+        "user": UserResponse(**current_user.dict()),
+        "products": products,
+        "more_products": more_products,
+        "orders": orders[:BOOTSTRAP_ORDERS_LIMIT],
+        "more_orders": len(orders) > BOOTSTRAP_ORDERS_LIMIT,
+    }
+    if current_user.user_type == "vendor":
+        categories, suppliers = vendor_extras
+        return VendorBootstrap(**payload, categories=sorted(categories), suppliers=suppliers)
+    return SupplierBootstrap(**payload)
+
 # Analytics routes
 @api_router.get("/analytics/vendor")
 async def get_vendor_analytics(current_user: User = Depends(get_current_user)):
@@ -380,7 +2189,7 @@ async def get_vendor_analytics(current_user: User = Depends(get_current_user)):
     
     # Get orders for the last 30 days
     thirty_days_ago = datetime.utcnow() - timedelta(days=30)
-    orders = await db.orders.find({
+    orders = await analytics_db.orders.find({
         "vendor_id": current_user.id,
         "created_at": {"$gte": thirty_days_ago}
     }).to_list(1000)
@@ -429,7 +2238,7 @@ async def get_supplier_analytics(current_user: User = Depends(get_current_user))
     
     # Get orders for the last 30 days
     thirty_days_ago = datetime.utcnow() - timedelta(days=30)
-    orders = await db.orders.find({
+    orders = await analytics_db.orders.find({
         "supplier_id": current_user.id,
         "created_at": {"$gte": thirty_days_ago}
     }).to_list(1000)
@@ -470,99 +2279,145 @@ async def get_supplier_analytics(current_user: User = Depends(get_current_user))
         "total_revenue": sum(order['total'] for order in orders)
     }
 
-@api_router.post("/seed-data")
-async def seed_sample_data(current_user: User = Depends(get_current_user)):
-    """Seed sample data for testing"""
+@api_router.get("/analytics/forecast", response_model=SupplierForecast)
+async def get_demand_forecast(method: Literal["exponential", "moving_average"] = "exponential",
+                              history_days: int = Query(90, ge=7, le=365),
+                              horizon_days: int = Query(7, ge=1, le=60),
+                              alpha: float = Query(0.3, gt=0, le=1),
+                              window: int = Query(14, ge=1, le=90),
+                              safety_factor: float = Query(0.2, ge=0, le=2),
+                              current_user: User = Depends(get_current_user)):
+    """Forecast demand for the supplier's active products and suggest restock quantities"""
     if current_user.user_type != "supplier":
-        raise HTTPException(status_code=403, detail="Only suppliers can seed data")
+        raise HTTPException(status_code=403, detail="Only suppliers can access demand forecasts")
+    try:
+        import numpy as np
+    except ImportError:
+        raise HTTPException(status_code=501, detail="Demand forecasting needs numpy installed")
     
-    sample_products = [
-        # Fruits
-        {"name": "Fresh Apples", "description": "Premium quality red apples", "price": 120.0, "unit": "kg", "category": "Fruits", "min_order_quantity": 5, "stock_quantity": 100},
-        {"name": "Bananas", "description": "Fresh yellow bananas", "price": 60.0, "unit": "kg", "category": "Fruits", "min_order_quantity": 10, "stock_quantity": 150},
-        {"name": "Fresh Oranges", "description": "Juicy oranges", "price": 80.0, "unit": "kg", "category": "Fruits", "min_order_quantity": 5, "stock_quantity": 80},
-        {"name": "Mangoes", "description": "Sweet alphonso mangoes", "price": 200.0, "unit": "kg", "category": "Fruits", "min_order_quantity": 3, "stock_quantity": 50},
-        {"name": "Grapes", "description": "Fresh green grapes", "price": 150.0, "unit": "kg", "category": "Fruits", "min_order_quantity": 2, "stock_quantity": 40},
-        
-        # Vegetables
-        {"name": "Fresh Tomatoes", "description": "Premium quality fresh tomatoes", "price": 45.0, "unit": "kg", "category": "Vegetables", "min_order_quantity": 5, "stock_quantity": 200},
-        {"name": "Onions", "description": "Fresh red onions", "price": 35.0, "unit": "kg", "category": "Vegetables", "min_order_quantity": 10, "stock_quantity": 300},
-        {"name": "Potatoes", "description": "Fresh potatoes", "price": 25.0, "unit": "kg", "category": "Vegetables", "min_order_quantity": 10, "stock_quantity": 500},
-        {"name": "Bell Peppers", "description": "Colorful bell peppers", "price": 80.0, "unit": "kg", "category": "Vegetables", "min_order_quantity": 3, "stock_quantity": 60},
-        {"name": "Carrots", "description": "Fresh carrots", "price": 55.0, "unit": "kg", "category": "Vegetables", "min_order_quantity": 5, "stock_quantity": 120},
-        
-        # Spices
-        {"name": "Turmeric Powder", "description": "Pure turmeric powder", "price": 200.0, "unit": "kg", "category": "Spices", "min_order_quantity": 1, "stock_quantity": 30},
-        {"name": "Red Chili Powder", "description": "Spicy red chili powder", "price": 300.0, "unit": "kg", "category": "Spices", "min_order_quantity": 1, "stock_quantity": 25},
-        {"name": "Cumin Seeds", "description": "Whole cumin seeds", "price": 400.0, "unit": "kg", "category": "Spices", "min_order_quantity": 1, "stock_quantity": 20},
-        {"name": "Coriander Seeds", "description": "Fresh coriander seeds", "price": 180.0, "unit": "kg", "category": "Spices", "min_order_quantity": 1, "stock_quantity": 35},
-        {"name": "Garam Masala", "description": "Authentic garam masala blend", "price": 500.0, "unit": "kg", "category": "Spices", "min_order_quantity": 1, "stock_quantity": 15},
-        
-        # Dairy
-        {"name": "Fresh Milk", "description": "Pure cow milk", "price": 55.0, "unit": "liters", "category": "Dairy", "min_order_quantity": 10, "stock_quantity": 100},
-        {"name": "Paneer", "description": "Fresh cottage cheese", "price": 250.0, "unit": "kg", "category": "Dairy", "min_order_quantity": 2, "stock_quantity": 40},
-        {"name": "Butter", "description": "Fresh butter", "price": 300.0, "unit": "kg", "category": "Dairy", "min_order_quantity": 1, "stock_quantity": 25},
-        {"name": "Yogurt", "description": "Fresh yogurt", "price": 80.0, "unit": "kg", "category": "Dairy", "min_order_quantity": 5, "stock_quantity": 60},
-        
-        # Grains
-        {"name": "Basmati Rice", "description": "Premium basmati rice", "price": 120.0, "unit": "kg", "category": "Grains", "min_order_quantity": 10, "stock_quantity": 200},
-        {"name": "Wheat Flour", "description": "Fresh wheat flour", "price": 45.0, "unit": "kg", "category": "Grains", "min_order_quantity": 20, "stock_quantity": 500},
-        {"name": "Lentils (Dal)", "description": "Mixed lentils", "price": 90.0, "unit": "kg", "category": "Grains", "min_order_quantity": 5, "stock_quantity": 150},
-        {"name": "Quinoa", "description": "Organic quinoa", "price": 400.0, "unit": "kg", "category": "Grains", "min_order_quantity": 2, "stock_quantity": 30},
-        
-        # Beverages
-        {"name": "Coconut Water", "description": "Fresh coconut water", "price": 40.0, "unit": "liters", "category": "Beverages", "min_order_quantity": 10, "stock_quantity": 80},
-        {"name": "Fresh Juice", "description": "Mixed fruit juice", "price": 60.0, "unit": "liters", "category": "Beverages", "min_order_quantity": 5, "stock_quantity": 50},
-        {"name": "Lassi", "description": "Traditional yogurt drink", "price": 50.0, "unit": "liters", "category": "Beverages", "min_order_quantity": 5, "stock_quantity": 40},
-        
-        # Bakery
-        {"name": "Bread", "description": "Fresh bread loaves", "price": 35.0, "unit": "pieces", "category": "Bakery", "min_order_quantity": 10, "stock_quantity": 100},
-        {"name": "Buns", "description": "Fresh burger buns", "price": 5.0, "unit": "pieces", "category": "Bakery", "min_order_quantity": 50, "stock_quantity": 200},
-        {"name": "Cookies", "description": "Assorted cookies", "price": 200.0, "unit": "kg", "category": "Bakery", "min_order_quantity": 2, "stock_quantity": 30},
-        
-        # Oils & Condiments
-        {"name": "Sunflower Oil", "description": "Pure sunflower oil", "price": 150.0, "unit": "liters", "category": "Oils & Condiments", "min_order_quantity": 5, "stock_quantity": 60},
-        {"name": "Mustard Oil", "description": "Pure mustard oil", "price": 180.0, "unit": "liters", "category": "Oils & Condiments", "min_order_quantity": 3, "stock_quantity": 40},
-        {"name": "Vinegar", "description": "Apple cider vinegar", "price": 120.0, "unit": "liters", "category": "Oils & Condiments", "min_order_quantity": 2, "stock_quantity": 25},
-        
-        # Frozen Items
-        {"name": "Frozen Vegetables", "description": "Mixed frozen vegetables", "price": 100.0, "unit": "kg", "category": "Frozen Items", "min_order_quantity": 5, "stock_quantity": 80},
-        {"name": "Frozen Fruits", "description": "Mixed frozen fruits", "price": 150.0, "unit": "kg", "category": "Frozen Items", "min_order_quantity": 3, "stock_quantity": 40},
-        
-        # Disposables
-        {"name": "Paper Plates", "description": "Disposable paper plates", "price": 2.0, "unit": "pieces", "category": "Disposables", "min_order_quantity": 100, "stock_quantity": 1000},
-        {"name": "Plastic Cups", "description": "Disposable plastic cups", "price": 1.5, "unit": "pieces", "category": "Disposables", "min_order_quantity": 100, "stock_quantity": 1500},
-        {"name": "Food Containers", "description": "Takeaway food containers", "price": 8.0, "unit": "pieces", "category": "Disposables", "min_order_quantity": 50, "stock_quantity": 500},
-    ]
+    # The last history_days complete days: today is still partial and would weigh most in smoothing
+    today = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
+    start = today - timedelta(days=history_days)
+    match = {"$match": {"supplier_id": current_user.id, "created_at": {"$gte": start, "$lt": today},
+                        "status": {"$ne": "cancelled"}}}
+    products_task = analytics_db.products.find(
+        {"supplier_id": current_user.id, "is_active": True},
+        {"_id": 0, "id": 1, "name": 1, "unit": 1, "stock_quantity": 1},
+    ).sort("id", 1).to_list(None)
+    demand_task = analytics_db.orders.aggregate([
+        match,
+        {"$unionWith": {"coll": "orders_archive", "pipeline": [match]}},
+        {"$unwind": "$items"},
+        {"$group": {
+            "_id": {"product_id": "$items.product_id",
+                    "day": {"$dateToString": {"format": "%Y-%m-%d", "date": "$created_at"}}},
+            "quantity": {"$sum": "$items.quantity"},
+        }},
+    ], allowDiskUse=True).to_list(None)
+    products, rows = await asyncio.gather(products_task, demand_task)
+    if not products:
+        return SupplierForecast(method=method, history_days=history_days, horizon_days=horizon_days, products=[])
     
-    # Insert sample products
-    for product_data in sample_products:
-        product_data['supplier_id'] = current_user.id
-        product_obj = Product(**product_data)
-        await db.products.insert_one(product_obj.dict())
+    matrix = demand_matrix(np, [product["id"] for product in products], rows, start, history_days)
+    daily = smoothed_demand(np, matrix, method, alpha, window)
+    stock = np.array([product["stock_quantity"] for product in products], dtype=float)
+    needed = daily * horizon_days * (1 + safety_factor)
+    restock = np.ceil(np.maximum(needed - stock, 0)).astype(int)
+    with np.errstate(divide="ignore"):
+        days_of_stock = np.where(daily > 0, stock / daily, np.inf)
     
-    return {"message": f"Successfully seeded {len(sample_products)} sample products"}
+    forecasts = []
+    # Products that run out soonest come first, larger restocks breaking ties
+    for i in np.lexsort((-restock, days_of_stock)):
+        product = products[i]
+        forecasts.append(ProductForecast(
+            product_id=product["id"], name=product["name"], unit=product["unit"],
+            stock_quantity=product["stock_quantity"], daily_demand=round(float(daily[i]), 3),
+            # Both models forecast a flat level over the horizon
+            forecast=[round(float(daily[i]), 3)] * horizon_days,
+            days_of_stock=round(float(days_of_stock[i]), 1) if np.isfinite(days_of_stock[i]) else None,
+            suggested_restock=int(restock[i]),
+        ))
+    return SupplierForecast(method=method, history_days=history_days, horizon_days=horizon_days, products=forecasts)
 
-# Make /suppliers public (remove auth requirement)
-@api_router.get("/suppliers", response_model=List[UserResponse])
-async def get_suppliers():
-    suppliers = await db.users.find({"user_type": "supplier", "is_active": True}).to_list(1000)
-    return [UserResponse(**{k: v for k, v in supplier.items() if k != 'password'}) for supplier in suppliers]
+# Export routes
+@api_router.get("/exports/orders")
+async def export_orders(file_format: Literal["csv", "parquet"] = Query("csv", alias="format"),
+                        start: Optional[datetime] = None, end: Optional[datetime] = None,
+                        current_user: User = Depends(get_current_user)):
+    """The user's orders, archived ones included, with one row per line item"""
+    stages = [
+        export_match(current_user, start, end),
+        {"$unwind": "$items"},
+        {"$project": {
+            "_id": 0, "order_id": "$id", "created_at": 1, "status": 1, "vendor_id": 1, "supplier_id": 1,
+            "product_id": "$items.product_id", "product_name": "$items.product_name",
+            "quantity": "$items.quantity", "unit": "$items.unit", "price": "$items.price",
+            "line_total": "$items.total", "order_subtotal": "$subtotal", "order_tax": "$tax",
+            "order_total": "$total",
+        }},
+    ]
+    cursor = analytics_db.orders.aggregate(
+        stages + [{"$unionWith": {"coll": "orders_archive", "pipeline": stages}},
+                  {"$sort": {"created_at": 1, "order_id": 1}}],
+        allowDiskUse=True, batchSize=EXPORT_BATCH_SIZE,
+    )
+    return await export_response(cursor, ORDER_EXPORT_COLUMNS, file_format, "orders")
 
-# Make /products public (remove auth requirement)
-@api_router.get("/products", response_model=List[Product])
-async def get_products(category: Optional[str] = None):
-    query = {"is_active": True}
-    if category:
-        query["category"] = category
-    products = await db.products.find(query).to_list(1000)
-    return [Product(**product) for product in products]
+@api_router.get("/exports/analytics")
+async def export_analytics(file_format: Literal["csv", "parquet"] = Query("csv", alias="format"),
+                           start: Optional[datetime] = None, end: Optional[datetime] = None,
+                           current_user: User = Depends(get_current_user)):
+    """Daily order counts and amounts, the figures behind the analytics dashboards"""
+    match = export_match(current_user, start, end)
+    cursor = analytics_db.orders.aggregate([
+        match,
+        {"$unionWith": {"coll": "orders_archive", "pipeline": [match]}},
+        {"$group": {
+            "_id": {"$dateToString": {"format": "%Y-%m-%d", "date": "$created_at"}},
+            "orders": {"$sum": 1},
+            "subtotal": {"$sum": "$subtotal"},
+            "tax": {"$sum": "$tax"},
+            "total": {"$sum": "$total"},
+        }},
+        {"$sort": {"_id": 1}},
+        {"$project": {"_id": 0, "date": "$_id", "orders": 1, "subtotal": 1, "tax": 1, "total": 1}},
+    ], allowDiskUse=True, batchSize=EXPORT_BATCH_SIZE)
+    return await export_response(cursor, ANALYTICS_EXPORT_COLUMNS, file_format, "analytics")
 
-# Make /categories public (remove auth requirement)
-@api_router.get("/categories")
-async def get_categories():
-    categories = await db.products.distinct("category", {"is_active": True})
-    return sorted(categories)
+@api_router.post("/seed-data")
+async def seed_sample_data(response: Response, background: bool = False,
+                           current_user: User = Depends(get_current_user)):
+    """Seed sample data for testing; with background=true it runs as a job and returns 202"""
+    if current_user.user_type != "supplier":
+        raise HTTPException(status_code=403, detail="Only suppliers can seed data")
+    
+    if background:
+        # Seeding is not idempotent, so a failed run is reported rather than retried
+        job = await enqueue_job("seed_data", current_user.id, max_attempts=1)
+        response.status_code = 202
+        return {"message": "Seeding sample products in the background", "job_id": job.id}
+    
+    inserted = await insert_sample_products(current_user.id)
+    return {"message": f"Successfully seeded {inserted} sample products"}
+
+# Job routes
+@api_router.get("/jobs", response_model=List[Job])
+async def get_jobs(status: Optional[str] = None, limit: int = Query(50, ge=1, le=200),
+                   current_user: User = Depends(get_current_user)):
+    query = {"owner_id": current_user.id}
+    if status:
+        query["status"] = status
+    return await db.jobs.find(query, {"_id": 0}).sort("created_at", -1).limit(limit).to_list(limit)
+
+@api_router.get("/jobs/{job_id}", response_model=Job)
+async def get_job(job_id: str, current_user: User = Depends(get_current_user)):
+    job = await db.jobs.find_one({"id": job_id}, {"_id": 0})
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    if job["owner_id"] != current_user.id:
+        raise HTTPException(status_code=403, detail="Access denied")
+    return job
 
 # Order routes
 @api_router.post("/orders", response_model=Order)
@@ -570,35 +2425,223 @@ async def create_order(order: OrderCreate, current_user: User = Depends(get_curr
     if current_user.user_type != "vendor":
         raise HTTPException(status_code=403, detail="Only vendors can create orders")
     
-    # Calculate totals
-    subtotal = sum(item.total for item in order.items)
-    tax = subtotal * 0.18  # 18% tax
-    total = subtotal + tax
+    order_obj = build_order(current_user.id, order.supplier_id, order.items, order.delivery_address,
+                            order.delivery_date)
+    
+    await place_orders([order_obj])
+    return order_obj
+
+@api_router.post("/orders/checkout", response_model=List[Order])
+async def checkout(cart: CheckoutRequest, current_user: User = Depends(get_current_user)):
+    """Place one order per supplier for a mixed cart in a single request"""
+    if current_user.user_type != "vendor":
+        raise HTTPException(status_code=403, detail="Only vendors can create orders")
+    if not cart.items:
+        raise HTTPException(status_code=400, detail="Cart is empty")
+    
+    # Group cart lines by supplier, keeping the order suppliers first appear in
+    items_by_supplier = {}
+    for item in cart.items:
+        line = OrderItem(**item.dict(exclude={"supplier_id"}))
+        items_by_supplier.setdefault(item.supplier_id, []).append(line)
+    
+    orders = [
+        build_order(current_user.id, supplier_id, items, cart.delivery_address, cart.delivery_date)
+        for supplier_id, items in items_by_supplier.items()
+    ]
+    await place_orders(orders)
+    return orders
+
+@api_router.get("/orders/frequent-items", response_model=List[SupplierFrequentItems])
+async def get_frequent_items(limit_per_supplier: int = Query(10, ge=1, le=50),
+                             current_user: User = Depends(get_current_user)):
+    """A vendor's most frequently ordered products per supplier, with current prices and stock"""
+    if current_user.user_type != "vendor":
+        raise HTTPException(status_code=403, detail="Only vendors have order history to reorder from")
+    
+    summary = await db.vendor_order_summaries.find_one({"vendor_id": current_user.id})
+    if summary is None or summary.get("building"):
+        summary = await build_vendor_summary(current_user.id)
+    
+    by_supplier = {}
+    for product_id, entry in summary["items"].items():
+        by_supplier.setdefault(entry["supplier_id"], []).append((product_id, entry))
+    top = {
+        supplier_id: sorted(entries, key=lambda e: (-e[1]["order_count"], e[1]["product_name"]))[:limit_per_supplier]
+        for supplier_id, entries in by_supplier.items()
+    }
+    product_ids = [product_id for entries in top.values() for product_id, _ in entries]
+    products = {
+        product["id"]: product
+        for product in await catalog_db.products.find(
+            {"id": {"$in": product_ids}}, {"_id": 0, "id": 1, "price": 1, "stock_quantity": 1, "is_active": 1}
+        ).to_list(len(product_ids))
+    }
     
-    order_dict = order.dict()
-    order_dict['vendor_id'] = current_user.id
-    order_dict['subtotal'] = subtotal
-    order_dict['tax'] = tax
-    order_dict['total'] = total
+    result = []
+    for supplier_id, entries in top.items():
+        items = []
+        for product_id, entry in entries:
+            product = products.get(product_id)
+            usual_quantity = round(entry["total_quantity"] / entry["order_count"])
+            items.append(FrequentItem(
+                product_id=product_id,
+                product_name=entry["product_name"],
+                unit=entry["unit"],
+                order_count=entry["order_count"],
+                usual_quantity=usual_quantity,
+                last_ordered_at=entry["last_ordered_at"],
+                price=product["price"] if product else None,
+                stock_quantity=product["stock_quantity"] if product else None,
+                available=bool(product and product.get("is_active", True)
+                               and product["stock_quantity"] >= usual_quantity),
+            ))
+        result.append(SupplierFrequentItems(supplier_id=supplier_id, items=items))
+    result.sort(key=lambda group: -sum(item.order_count for item in group.items))
+    return result
+
+@api_router.post("/orders/{order_id}/reorder", response_model=Order)
+async def reorder(order_id: str, current_user: User = Depends(get_current_user)):
+    """Place a new order with the same lines as a previous one, at current prices"""
+    if current_user.user_type != "vendor":
+        raise HTTPException(status_code=403, detail="Only vendors can create orders")
+    
+    previous = await find_order({"id": order_id})
+    if not previous:
+        raise HTTPException(status_code=404, detail="Order not found")
+    if previous["vendor_id"] != current_user.id:
+        raise HTTPException(status_code=403, detail="Access denied")
     
-    order_obj = Order(**order_dict)
+    quantities = _quantities_by_product([OrderItem(**item) for item in previous["items"]])
+    products = await db.products.find(
+        {"id": {"$in": list(quantities)}, "supplier_id": previous["supplier_id"], "is_active": True}
+    ).to_list(len(quantities))
+    # A one-tap reorder places the whole basket or nothing, never a quietly smaller one
+    unavailable = [product_id for product_id in quantities if product_id not in {product["id"] for product in products}]
+    if unavailable:
+        names = {item["product_id"]: item["product_name"] for item in previous["items"]}
+        raise HTTPException(status_code=409, detail="No longer available: " + ", ".join(
+            f"{names[product_id]} ({product_id})" for product_id in unavailable))
     
-    await db.orders.insert_one(order_obj.dict())
+    items = [
+        OrderItem(
+            product_id=product["id"],
+            product_name=product["name"],
+            quantity=quantities[product["id"]],
+            price=product["price"],
+            unit=product["unit"],
+            total=product["price"] * quantities[product["id"]],
+        )
+        for product in products
+    ]
+    order_obj = build_order(current_user.id, previous["supplier_id"], items, previous["delivery_address"])
+    await place_orders([order_obj])
     return order_obj
 
-@api_router.get("/orders", response_model=List[Order])
-async def get_orders(current_user: User = Depends(get_current_user)):
+@api_router.get("/orders", response_model=List[OrderWithCounterparty])
+async def get_orders(response: Response, include_archived: bool = False,
+                     status: Optional[str] = Query(None, description="Comma separated statuses"),
+                     start: Optional[datetime] = None, end: Optional[datetime] = None,
+                     counterparty_id: Optional[str] = Query(None, description="The supplier for vendors, the vendor for suppliers"),
+                     min_total: Optional[float] = Query(None, ge=0),
+                     sort: Literal["newest", "oldest", "total_desc", "total_asc"] = "newest",
+                     limit: int = Query(ORDER_PAGE_LIMIT, ge=1, le=ORDER_PAGE_LIMIT),
+                     cursor: Optional[str] = None,
+                     if_none_match: Optional[str] = Header(None),
+                     current_user: User = Depends(get_current_user)):
+    """The user's orders, filtered and sorted on indexes; X-Next-Cursor carries on when more match"""
     if current_user.user_type == "vendor":
-        orders = await db.orders.find({"vendor_id": current_user.id}).to_list(1000)
+        party_query, counterparty_field = {"vendor_id": current_user.id}, "supplier_id"
     else:
-        orders = await db.orders.find({"supplier_id": current_user.id}).to_list(1000)
+        party_query, counterparty_field = {"supplier_id": current_user.id}, "vendor_id"
+    statuses = list(dict.fromkeys(value.strip() for value in (status or "").split(",") if value.strip()))
+    unknown = [value for value in statuses if value not in ORDER_TRANSITIONS]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown status: {', '.join(unknown)}")
+    query, order_sort = order_listing_query(party_query, counterparty_field, statuses, start, end,
+                                            counterparty_id, min_total, sort, cursor)
+    
+    # Pollers send back the last ETag; answer 304 before touching any order documents
+    etag = await orders_change_token(party_query, include_archived, listing=(query, sort, limit))
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers=headers)
+    response.headers.update(headers)
     
-    return [Order(**order) for order in orders]
+    # One extra order tells whether there is a next page
+    pipeline = orders_with_counterparty_pipeline(query, counterparty_field, limit + 1, sort=order_sort)
+    orders = await db.orders.aggregate(pipeline).to_list(limit + 1)
+    if include_archived:
+        # Both collections come back in the same order, so merging them keeps the page sorted
+        orders += await db.orders_archive.aggregate(pipeline).to_list(limit + 1)
+        field, direction = ORDER_SORTS[sort]
+        orders.sort(key=lambda order: (order[field], order["id"]), reverse=direction < 0)
+    if len(orders) > limit:
+        orders = orders[:limit]
+        response.headers["X-Next-Cursor"] = encode_order_cursor(sort, orders[-1])
+    
+    return [OrderWithCounterparty(**order) for order in orders]
+
+@api_router.patch("/orders/{order_id}/status", response_model=Order)
+async def update_order_status(order_id: str, update: OrderStatusUpdate, current_user: User = Depends(get_current_user)):
+    """Move an order through its state machine in a single guarded write"""
+    if update.status not in ORDER_TRANSITIONS:
+        raise HTTPException(status_code=400, detail=f"Unknown status: {update.status}")
+    if current_user.user_type == "vendor" and update.status != "cancelled":
+        raise HTTPException(status_code=403, detail="Vendors can only cancel orders")
+    
+    # Stored datetimes are truncated to milliseconds
+    def to_millis(value: datetime):
+        return value.replace(microsecond=value.microsecond // 1000 * 1000)
+    
+    party_field = "vendor_id" if current_user.user_type == "vendor" else "supplier_id"
+    from_states = [state for state, targets in ORDER_TRANSITIONS.items() if update.status in targets]
+    query = {"id": order_id, party_field: current_user.id, "status": {"$in": from_states}}
+    if update.expected_updated_at is not None:
+        query["updated_at"] = to_millis(update.expected_updated_at)
+    changes = {"status": update.status, "updated_at": to_millis(datetime.utcnow())}
+    if update.status == "cancelled":
+        changes["stock_reserved"] = False
+    
+    released = []
+    
+    async def transition(session=None):
+        # The pre-image tells us whether this write is the one that un-reserved the stock
+        before = await db.orders.find_one_and_update(
+            query,
+            {"$set": changes},
+            projection={"_id": 0},
+            return_document=ReturnDocument.BEFORE,
+            session=session,
+        )
+        if before is None:
+            existing = await find_order({"id": order_id}, {party_field: 1, "status": 1}, session=session)
+            if not existing:
+                raise HTTPException(status_code=404, detail="Order not found")
+            if existing[party_field] != current_user.id:
+                raise HTTPException(status_code=403, detail="Access denied")
+            raise HTTPException(
+                status_code=409,
+                detail=f"Order is {existing['status']} or was modified; cannot change it to {update.status}",
+            )
+        if update.status == "cancelled" and before.get("stock_reserved"):
+            await release_stock([OrderItem(**item) for item in before["items"]], session=session)
+            released.extend(item["product_id"] for item in before["items"])
+        return {**before, **changes}
+    
+    if update.status == "cancelled" and await supports_transactions():
+        async with await client.start_session() as session:
+            async with session.start_transaction():
+                order = await transition(session)
+    else:
+        order = await transition()
+    await record_price_history(released)
+    return Order(**order)
 
 @api_router.get("/orders/{order_id}/receipt")
 async def download_receipt(order_id: str, current_user: User = Depends(get_current_user)):
-    # Get order
-    order = await db.orders.find_one({"id": order_id})
+    # Get order joined with both parties, falling back to the archive
+    order = await find_order_with_parties(order_id)
     if not order:
         raise HTTPException(status_code=404, detail="Order not found")
     
@@ -608,9 +2651,9 @@ async def download_receipt(order_id: str, current_user: User = Depends(get_curre
     elif current_user.user_type == "supplier" and order['supplier_id'] != current_user.id:
         raise HTTPException(status_code=403, detail="Access denied")
     
-    # Get vendor and supplier info
-    vendor = await db.users.find_one({"id": order['vendor_id']})
-    supplier = await db.users.find_one({"id": order['supplier_id']})
+    # Vendor and supplier info came with the order
+    vendor = order['vendor'][0] if order['vendor'] else None
+    supplier = order['supplier'][0] if order['supplier'] else None
     
     if not vendor or not supplier:
         raise HTTPException(status_code=404, detail="User information not found")
@@ -641,6 +2684,294 @@ async def download_receipt(order_id: str, current_user: User = Depends(get_curre
         headers={"Content-Disposition": f"attachment; filename=receipt_{order_id[:8]}.pdf"}
     )
 
+def statement_order_stages(supplier_id: str, vendor_id: str, period_start: datetime, period_end: datetime):
+    # Only the fields a statement line needs; run on both the hot collection and the archive
+    query = {"supplier_id": supplier_id, "vendor_id": vendor_id,
+             "created_at": {"$gte": period_start, "$lt": period_end}}
+    return [
+        {"$match": query},
+        {"$project": {"_id": 0, "id": 1, "created_at": 1, "status": 1, "subtotal": 1, "tax": 1, "total": 1,
+                      "item_count": {"$size": "$items"}}},
+    ]
+
+def parse_statement_month(month: str):
+    try:
+        period_start = datetime.strptime(month, "%Y-%m")
+    except ValueError:
+        raise HTTPException(status_code=400, detail="month must be formatted as YYYY-MM")
+    return period_start, (period_start + timedelta(days=32)).replace(day=1)
+
+async def write_statement(out, supplier_id: str, vendor_id: str, month: str) -> str:
+    """Render one vendor's monthly statement from a supplier into `out`; returns the statement number."""
+    period_start, period_end = parse_statement_month(month)
+    vendor = await db.users.find_one({"id": vendor_id, "user_type": "vendor"}, RECEIPT_PARTY_PROJECTION)
+    supplier = await db.users.find_one({"id": supplier_id}, RECEIPT_PARTY_PROJECTION)
+    if not vendor or not supplier:
+        raise HTTPException(status_code=404, detail="User information not found")
+    
+    stages = statement_order_stages(supplier_id, vendor_id, period_start, period_end)
+    orders = db.orders.aggregate(
+        stages + [{"$unionWith": {"coll": "orders_archive", "pipeline": stages}},
+                  {"$sort": {"created_at": 1, "id": 1}}],
+        allowDiskUse=True, batchSize=STATEMENT_BATCH_SIZE,
+    )
+    statement_no = f"{supplier_id[:4]}{vendor_id[:4]}-{period_start:%Y%m}".upper()
+    detail_rows = [
+        ['Statement No:', statement_no],
+        ['Period:', period_start.strftime('%B %Y')],
+        ['Issued:', datetime.utcnow().strftime('%d/%m/%Y')],
+    ]
+    await render_statement_pdf(out, orders, detail_rows, VendorInfo(**vendor), SupplierInfo(**supplier))
+    return statement_no
+
+@job_handler("statement")
+async def statement_job(job: dict) -> dict:
+    bucket = AsyncIOMotorGridFSBucket(db, bucket_name="statements")
+    # Files are kept as long as the jobs that point at them
+    expired = datetime.utcnow() - timedelta(seconds=JOB_RETENTION_SECONDS)
+    async for old in bucket.find({"uploadDate": {"$lt": expired}}):
+        await bucket.delete(old._id)
+    
+    with tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_BYTES) as spool:
+        statement_no = await write_statement(spool, job["owner_id"], job["params"]["vendor_id"],
+                                             job["params"]["month"])
+        spool.seek(0)
+        filename = f"statement_{statement_no}.pdf"
+        file_id = await bucket.upload_from_stream(filename, spool, metadata={"job_id": job["id"]})
+    return {"file_id": str(file_id), "filename": filename}
+
+@api_router.get("/statements/{vendor_id}")
+async def download_statement(vendor_id: str, month: str = Query(..., description="Statement month as YYYY-MM"),
+                             current_user: User = Depends(get_current_user)):
+    """A supplier's consolidated monthly statement for one vendor as a PDF.
+
+    Statements above STATEMENT_SYNC_MAX_ORDERS orders are built in the background: the
+    response is 202 with a job id, and the PDF is fetched from /api/statements/files/{job_id}.
+    """
+    if current_user.user_type != "supplier":
+        raise HTTPException(status_code=403, detail="Only suppliers can issue statements")
+    period_start, period_end = parse_statement_month(month)
+    
+    query = statement_order_stages(current_user.id, vendor_id, period_start, period_end)[0]["$match"]
+    count = sum(await asyncio.gather(db.orders.count_documents(query), db.orders_archive.count_documents(query)))
+    if count > STATEMENT_SYNC_MAX_ORDERS:
+        job = await enqueue_job("statement", current_user.id, {"vendor_id": vendor_id, "month": month})
+        return JSONResponse(status_code=202, content={
+            "message": f"Building a statement of {count} orders in the background", "job_id": job.id})
+    
+    # reportlab writes the cross-reference table last, so the finished file is streamed from a spool
+    spool = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_BYTES)
+    try:
+        statement_no = await write_statement(spool, current_user.id, vendor_id, month)
+    except BaseException:
+        spool.close()
+        raise
+    
+    return StreamingResponse(
+        iter_spooled(spool),
+        media_type="application/pdf",
+        headers={"Content-Disposition": f"attachment; filename=statement_{statement_no}.pdf"}
+    )
+
+@api_router.get("/statements/files/{job_id}")
+async def download_statement_file(job_id: str, current_user: User = Depends(get_current_user)):
+    """The PDF built by a statement job"""
+    job = await db.jobs.find_one({"id": job_id, "type": "statement"}, {"_id": 0})
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    if job["owner_id"] != current_user.id:
+        raise HTTPException(status_code=403, detail="Access denied")
+    if job["status"] != "succeeded":
+        raise HTTPException(status_code=409, detail=f"Statement job is {job['status']}")
+    
+    bucket = AsyncIOMotorGridFSBucket(db, bucket_name="statements")
+    try:
+        stream = await bucket.open_download_stream(ObjectId(job["result"]["file_id"]))
+    except NoFile:
+        raise HTTPException(status_code=404, detail="Statement file has expired")
+    
+    async def chunks():
+        while chunk := await stream.readchunk():
+            yield chunk
+    
+    return StreamingResponse(
+        chunks(),
+        media_type="application/pdf",
+        headers={"Content-Disposition": f"attachment; filename={job['result']['filename']}"}
+    )
+
+# Compact responses: the list endpoints below are served as MessagePack when the client
+# accepts application/msgpack, and compressed with brotli or gzip above COMPRESSION_MIN_BYTES
+COMPACT_PATH_PREFIXES = ("/api/products", "/api/orders", "/api/suppliers", "/api/bootstrap")
+# Catalog listings are shared by many users, so their encoded bodies are cached by content
+CACHED_COMPACT_PATH_PREFIXES = ("/api/products", "/api/suppliers")
+MSGPACK_MEDIA_TYPE = "application/msgpack"
+COMPRESSED_CACHE_SIZE = 256
+_compressed_cache: Dict[tuple, bytes] = {}
+ISO_DATETIME = re.compile(r"\d{4}-\d{2}-\d{2}T\d{2}:\d{2}:\d{2}(\.\d{1,6})?")
+# The datetime fields of the models served on COMPACT_PATH_PREFIXES; any other string, such as a
+# product name that happens to look like a date, is left a string
+MSGPACK_DATETIME_FIELDS = {"created_at", "updated_at", "delivery_date", "last_ordered_at", "period_start"}
+
+def _msgpack_timestamps(value):
+    """Replace the datetime fields of a decoded JSON body with MessagePack timestamps."""
+    if isinstance(value, list):
+        return [_msgpack_timestamps(item) for item in value]
+    if isinstance(value, dict):
+        return {
+            key: _msgpack_timestamp(item) if key in MSGPACK_DATETIME_FIELDS else _msgpack_timestamps(item)
+            for key, item in value.items()
+        }
+    return value
+
+def _msgpack_timestamp(value):
+    if isinstance(value, str) and ISO_DATETIME.fullmatch(value):
+        # Stored datetimes are naive UTC
+        return msgpack.Timestamp.from_datetime(datetime.fromisoformat(value).replace(tzinfo=timezone.utc))
+    return value
+
+def negotiate_encoding(accept_encoding: str) -> Optional[str]:
+    """Pick br or gzip from an Accept-Encoding header, honouring q=0 refusals."""
+    offered = {}
+    for part in accept_encoding.split(","):
+        coding, _, params = part.partition(";")
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        offered[coding.strip().lower()] = quality
+    for coding in ("br", "gzip"):
+        if coding == "br" and brotli is None:
+            continue
+        if offered.get(coding, offered.get("*", 0.0)) > 0:
+            return coding
+    return None
+
+def compact_body(body: bytes, as_msgpack: bool, encoding: Optional[str]) -> bytes:
+    """Re-encode a JSON response body as MessagePack and/or compress it."""
+    if as_msgpack:
+        body = msgpack.packb(_msgpack_timestamps(json.loads(body)))
+    if encoding == "br":
+        return brotli.compress(body, quality=BROTLI_QUALITY)
+    if encoding == "gzip":
+        return gzip.compress(body, compresslevel=GZIP_LEVEL, mtime=0)
+    return body
+
+@app.middleware("http")
+async def compact_responses(request: Request, call_next):
+    response = await call_next(request)
+    if (request.method != "GET" or response.status_code != 200
+            or not request.url.path.startswith(COMPACT_PATH_PREFIXES)
+            or response.headers.get("content-type") != "application/json"):
+        return response
+    
+    body = b"".join([chunk async for chunk in response.body_iterator])
+    as_msgpack = msgpack is not None and MSGPACK_MEDIA_TYPE in request.headers.get("accept", "")
+    encoding = None
+    if len(body) >= COMPRESSION_MIN_BYTES:
+        encoding = negotiate_encoding(request.headers.get("accept-encoding", ""))
+    
+    headers = {key: value for key, value in response.headers.items() if key not in ("content-length", "content-type")}
+    headers["Vary"] = "Accept, Accept-Encoding"
+    if encoding:
+        headers["Content-Encoding"] = encoding
+    
+    if not as_msgpack and not encoding:
+        content = body
+    elif request.url.path.startswith(CACHED_COMPACT_PATH_PREFIXES):
+        cache_key = (hashlib.sha1(body).digest(), as_msgpack, encoding)
+        content = _compressed_cache.get(cache_key)
+        if content is None:
+            content = await asyncio.to_thread(compact_body, body, as_msgpack, encoding)
+            if len(_compressed_cache) >= COMPRESSED_CACHE_SIZE:
+                _compressed_cache.clear()
+            _compressed_cache[cache_key] = content
+    else:
+        content = await asyncio.to_thread(compact_body, body, as_msgpack, encoding)
+    
+    return Response(content=content, status_code=response.status_code, headers=headers,
+                    media_type=MSGPACK_MEDIA_TYPE if as_msgpack else "application/json")
+
+# Deadlines and load shedding. The handler runs inside pymongo.timeout(), so every Mongo
+# operation it makes carries the request's remaining budget as maxTimeMS and fails fast
+# once it is spent. Registered after compact_responses so it wraps it.
+# Downloads stream or render for as long as the data takes, so they run without a deadline;
+# like every route they hold their in-flight slot until the last byte of the body is sent.
+REQUEST_TIMEOUT_HEADER = "X-Request-Timeout-Ms"
+UNBOUNDED_PATH_PREFIXES = ("/api/exports", "/api/statements")
+_in_flight: Dict[str, int] = {}
+
+def route_class(method: str, path: str) -> str:
+    if path.startswith(("/api/analytics", "/api/exports", "/api/statements")):
+        return "analytics"
+    if path.startswith("/api/orders") and method != "GET":
+        return "orders"
+    if path.startswith(("/api/products", "/api/categories", "/api/suppliers", "/api/bootstrap")):
+        return "catalog"
+    return "default"
+
+def shed_load(detail: str) -> JSONResponse:
+    return JSONResponse(status_code=503, content={"detail": detail}, headers={"Retry-After": "1"})
+
+async def release_after_body(body_iterator, release: Callable[[], None]):
+    try:
+        async for chunk in body_iterator:
+            yield chunk
+    finally:
+        release()
+
+@app.middleware("http")
+async def enforce_deadlines(request: Request, call_next):
+    if not request.url.path.startswith("/api"):
+        return await call_next(request)
+    
+    kind = route_class(request.method, request.url.path)
+    budget = None
+    if not request.url.path.startswith(UNBOUNDED_PATH_PREFIXES):
+        budget = REQUEST_DEADLINES.get(kind, REQUEST_DEADLINES["default"])
+        requested = request.headers.get(REQUEST_TIMEOUT_HEADER)
+        if requested is not None:
+            try:
+                budget = min(budget, float(requested) / 1000)
+            except ValueError:
+                return JSONResponse(status_code=400, content={"detail": f"{REQUEST_TIMEOUT_HEADER} must be a number"})
+        if budget * 1000 < REQUEST_MIN_BUDGET_MS:
+            return shed_load("Not enough time left to serve the request")
+    
+    limit = ROUTE_CLASS_MAX_IN_FLIGHT.get(kind, 0)
+    if limit and _in_flight.get(kind, 0) >= limit:
+        return shed_load(f"Too many {kind} requests in progress")
+    
+    _in_flight[kind] = _in_flight.get(kind, 0) + 1
+    released = False
+    
+    def release():
+        nonlocal released
+        if not released:
+            released = True
+            _in_flight[kind] -= 1
+    
+    try:
+        if budget is None:
+            response = await call_next(request)
+        else:
+            with pymongo.timeout(budget):
+                response = await call_next(request)
+    except PyMongoError as exc:
+        release()
+        if budget is None or not exc.timeout:
+            raise
+        logger.warning(f"{request.method} {request.url.path} ran out of its {budget:.2f}s deadline: {exc}")
+        return shed_load("The request deadline was exceeded")
+    except BaseException:
+        release()
+        raise
+    response.body_iterator = release_after_body(response.body_iterator, release)
+    return response
+
 # Include the router in the main app
 app.add_middleware(
     CORSMiddleware,
@@ -648,6 +2979,7 @@ app.add_middleware(
     allow_origins=["*"],
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"],
 )
 
 app.include_router(api_router)
@@ -660,8 +2992,102 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+async def create_price_history_collection():
+    if await db.list_collection_names(filter={"name": "product_price_history"}):
+        return
+    options = {"timeseries": {"timeField": "recorded_at", "metaField": "product_id", "granularity": "hours"}}
+    if PRICE_HISTORY_RETENTION_DAYS > 0:
+        options["expireAfterSeconds"] = PRICE_HISTORY_RETENTION_DAYS * 24 * 3600
+    try:
+        await db.create_collection("product_price_history", **options)
+    except CollectionInvalid:
+        pass  # another worker created it first
+
+async def create_invalidation_collection():
+    if await db.list_collection_names(filter={"name": "cache_invalidations"}):
+        return
+    try:
+        await db.create_collection("cache_invalidations", capped=True, size=INVALIDATION_BUS_BYTES)
+    except CollectionInvalid:
+        return  # another worker created it first
+    # Tailable cursors die on an empty collection, so start it with an event nothing handles
+    await db.cache_invalidations.insert_one({"entity": "bus", "id": None, "version": None,
+                                             "published_at": datetime.utcnow()})
+
+@app.on_event("startup")
+async def create_indexes():
+    await create_price_history_collection()
+    if INVALIDATION_BUS_BYTES:
+        await create_invalidation_collection()
+    await db.users.create_index([("location", "2dsphere"), ("user_type", 1), ("is_active", 1)])
+    await db.users.create_index("id")
+    await db.users.create_index("email")
+    await db.users.create_index([("user_type", 1), ("is_active", 1)])
+    await db.products.create_index("id")
+    await db.products.create_index([("is_active", 1), ("category", 1), ("supplier_id", 1)])
+    await db.products.create_index([("supplier_id", 1), ("is_active", 1)])  # one supplier's catalog
+    await db.products.create_index([("updated_at", 1), ("id", 1)])
+    await db.orders.create_index("id")
+    await db.orders.create_index([("status", 1), ("updated_at", 1)])
+    await db.orders.create_index([("vendor_id", 1), ("updated_at", 1)])
+    await db.orders.create_index([("supplier_id", 1), ("updated_at", 1)])
+    await db.orders_archive.create_index("id")
+    # Order listings: party, then the filter, then the sort key with id as the tie-breaker.
+    # The (party, created_at, id) indexes also serve date ranges for analytics and statements.
+    for collection in (db.orders, db.orders_archive):
+        for party, counterparty in (("vendor_id", "supplier_id"), ("supplier_id", "vendor_id")):
+            await collection.create_index([(party, 1), ("created_at", 1), ("id", 1)])
+            await collection.create_index([(party, 1), ("status", 1), ("created_at", 1), ("id", 1)])
+            await collection.create_index([(party, 1), (counterparty, 1), ("created_at", 1), ("id", 1)])
+            await collection.create_index([(party, 1), ("total", 1), ("id", 1)])
+    await db.vendor_order_summaries.create_index("vendor_id", unique=True)
+    await db.product_price_history.create_index([("product_id", 1), ("recorded_at", 1)])
+    await db.jobs.create_index("id")
+    await db.jobs.create_index([("status", 1), ("type", 1), ("run_after", 1)])
+    await db.jobs.create_index([("status", 1), ("lease_until", 1)])
+    await db.jobs.create_index([("owner_id", 1), ("created_at", -1)])
+    await db.jobs.create_index("expires_at", expireAfterSeconds=0)
+
+@app.on_event("startup")
+async def backfill_product_updated_at():
+    # Products written before delta sync have no updated_at; start them at their creation time
+    await db.products.update_many(
+        {"updated_at": {"$exists": False}},
+        [{"$set": {"updated_at": "$created_at"}}],
+    )
+
+archival_task: Optional[asyncio.Task] = None
+
+@app.on_event("startup")
+async def start_order_archival():
+    global archival_task
+    if ORDER_ARCHIVE_AFTER_DAYS > 0:
+        archival_task = asyncio.create_task(run_order_archival())
+
+job_workers: List[asyncio.Task] = []
+invalidation_listener: Optional[asyncio.Task] = None
+
+@app.on_event("startup")
+async def start_job_workers():
+    job_workers.extend(asyncio.create_task(run_job_worker()) for _ in range(JOB_WORKERS))
+
+@app.on_event("startup")
+async def start_invalidation_listener():
+    global invalidation_listener
+    if INVALIDATION_BUS_BYTES:
+        invalidation_listener = asyncio.create_task(run_invalidation_listener())
+
 @app.on_event("shutdown")
 async def shutdown_db_client():
+    if archival_task:
+        archival_task.cancel()
+    if invalidation_listener:
+        invalidation_listener.cancel()
+    # Interrupted jobs stay running until their lease lapses, then another worker retakes them
+    for worker in job_workers:
+        worker.cancel()
+    if order_batcher:
+        await order_batcher.drain()
     client.close()
 
 # --- Add this block to allow running with `python server.py` ---
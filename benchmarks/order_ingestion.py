@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+"""Orders per second placed by concurrent clients, with micro-batched ingestion on and off.
+
+Each client places single-item orders back to back through place_orders, the path behind
+POST /api/orders, against a scratch database on MONGO_URL that is dropped afterwards.
+Clients order different products, so the numbers measure the insert path rather than
+contention on one product's stock.
+
+Needs a running MongoDB. Run from the repository root:
+    python benchmarks/order_ingestion.py --clients 50 200 1000 --orders-per-client 20
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--clients", type=int, nargs="+", default=[50, 200, 1000])
+    parser.add_argument("--orders-per-client", type=int, default=20)
+    parser.add_argument("--products", type=int, default=1000)
+    parser.add_argument("--batch-size", type=int, default=100)
+    parser.add_argument("--batch-delay-ms", type=float, default=2)
+    parser.add_argument("--db-name", default="streetfood_ingestion_bench")
+    return parser.parse_args()
+
+
+async def place_all(server, products, clients, orders_per_client):
+    async def client(index):
+        product = products[index % len(products)]
+        for _ in range(orders_per_client):
+            item = server.OrderItem(product_id=product.id, product_name=product.name, quantity=1,
+                                    price=product.price, unit=product.unit, total=product.price)
+            await server.place_orders([server.build_order(f"vendor-{index}", "supplier", [item], "Bench Street", None)])
+
+    started = time.perf_counter()
+    await asyncio.gather(*(client(index) for index in range(clients)))
+    return clients * orders_per_client / (time.perf_counter() - started)
+
+
+async def run(opts):
+    import server
+
+    products = [server.Product(**server.SAMPLE_PRODUCTS[i % len(server.SAMPLE_PRODUCTS)], supplier_id="supplier")
+                for i in range(opts.products)]
+    for product in products:
+        product.stock_quantity = 10 ** 9
+    await server.db.products.insert_many([product.dict() for product in products])
+    await server.create_indexes()
+
+    batcher = server.OrderBatcher(opts.batch_size, opts.batch_delay_ms / 1000)
+    print(f"{'clients':>8} {'unbatched/s':>12} {'batched/s':>10} {'speedup':>8}")
+    try:
+        for clients in opts.clients:
+            server.order_batcher = None
+            unbatched = await place_all(server, products, clients, opts.orders_per_client)
+            server.order_batcher = batcher
+            batched = await place_all(server, products, clients, opts.orders_per_client)
+            print(f"{clients:>8} {unbatched:>12,.0f} {batched:>10,.0f} {batched / unbatched:>7.2f}x")
+    finally:
+        await server.client.drop_database(opts.db_name)
+        server.client.close()
+
+
+def main():
+    opts = parse_args()
+    # server.py binds its database at import, so point it at the scratch one first
+    os.environ["DB_NAME"] = opts.db_name
+    asyncio.run(run(opts))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+"""Per-receipt render time: direct-canvas fast path vs full platypus layout.
+
+Run from the repository root:
+    python benchmarks/receipt_render.py --iterations 200
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+from server import (  # noqa: E402
+    Order, OrderItem, SupplierInfo, VendorInfo,
+    generate_receipt_pdf, render_receipt_fast, render_receipt_platypus,
+)
+
+
+def sample_order(item_count):
+    items = [
+        OrderItem(product_id=f"p{i}", product_name=f"Fresh Tomatoes {i}", quantity=10,
+                  price=45.5, unit="kg", total=455.0)
+        for i in range(item_count)
+    ]
+    subtotal = sum(item.total for item in items)
+    return Order(vendor_id="vendor", supplier_id="supplier", items=items, subtotal=subtotal,
+                 tax=subtotal * 0.18, total=subtotal * 1.18, delivery_address="123 Street Food Lane, Mumbai")
+
+
+def time_renderer(render, args, iterations):
+    render(*args)  # warm up font and module caches
+    started = time.perf_counter()
+    for _ in range(iterations):
+        render(*args)
+    return (time.perf_counter() - started) / iterations * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=200)
+    opts = parser.parse_args()
+
+    vendor = VendorInfo(name="Test Vendor", address="123 Street Food Lane, Mumbai",
+                        phone="9876543210", email="vendor@test.com")
+    supplier = SupplierInfo(name="Test Supplier", address="456 Supply Street, Delhi",
+                            phone="9876543211", email="supplier@test.com")
+
+    print(f"{'items':>6} {'platypus ms':>12} {'fast ms':>9} {'speedup':>8} {'dispatch ms':>12}")
+    for item_count in (1, 3, 10, 18, 40):
+        args = (sample_order(item_count), vendor, supplier)
+        slow = time_renderer(render_receipt_platypus, args, opts.iterations)
+        dispatched = time_renderer(generate_receipt_pdf, args, opts.iterations)
+        if item_count <= 18:
+            fast = time_renderer(render_receipt_fast, args, opts.iterations)
+            print(f"{item_count:>6} {slow:>12.2f} {fast:>9.2f} {slow / fast:>7.1f}x {dispatched:>12.2f}")
+        else:
+            print(f"{item_count:>6} {slow:>12.2f} {'(multi-page)':>18} {dispatched:>12.2f}")
+
+
+if __name__ == "__main__":
+    main()
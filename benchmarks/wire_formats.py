@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""Bytes on the wire and encoding CPU per response format for the list endpoints.
+
+Builds /api/products and /api/orders sized payloads, encodes them the way the
+compact_responses middleware does, and reports size and per-request CPU time.
+Cached rows show what a repeat catalog request costs once its encoded body is cached.
+
+Run from the repository root:
+    python benchmarks/wire_formats.py --products 1000 --orders 200 --iterations 20
+"""
+import argparse
+import hashlib
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+from fastapi.encoders import jsonable_encoder  # noqa: E402
+from fastapi.responses import JSONResponse  # noqa: E402
+
+from server import (  # noqa: E402
+    SAMPLE_PRODUCTS, Counterparty, OrderItem, OrderWithCounterparty, Product,
+    brotli, compact_body, msgpack,
+)
+
+FORMATS = [("json", False, None), ("json+gzip", False, "gzip"), ("json+br", False, "br"),
+           ("msgpack", True, None), ("msgpack+gzip", True, "gzip"), ("msgpack+br", True, "br")]
+
+
+def products_body(count):
+    products = [Product(**SAMPLE_PRODUCTS[i % len(SAMPLE_PRODUCTS)], supplier_id=f"supplier-{i % 50}")
+                for i in range(count)]
+    return JSONResponse(jsonable_encoder(products)).body
+
+
+def orders_body(count):
+    orders = []
+    for i in range(count):
+        items = [
+            OrderItem(product_id=f"p{j}", product_name=SAMPLE_PRODUCTS[j]["name"], quantity=10,
+                      price=SAMPLE_PRODUCTS[j]["price"], unit=SAMPLE_PRODUCTS[j]["unit"],
+                      total=SAMPLE_PRODUCTS[j]["price"] * 10)
+            for j in range(i % 5 + 1)
+        ]
+        subtotal = sum(item.total for item in items)
+        orders.append(OrderWithCounterparty(
+            vendor_id="vendor", supplier_id=f"supplier-{i % 50}", items=items, subtotal=subtotal,
+            tax=subtotal * 0.18, total=subtotal * 1.18, delivery_address="123 Street Food Lane, Mumbai",
+            counterparty=Counterparty(id=f"supplier-{i % 50}", name="Sharma Traders", phone="9876543211",
+                                      address="456 Supply Street, Delhi"),
+        ))
+    return JSONResponse(jsonable_encoder(orders)).body
+
+
+def time_ms(func, iterations):
+    func()
+    started = time.process_time()
+    for _ in range(iterations):
+        func()
+    return (time.process_time() - started) / iterations * 1000
+
+
+def report(name, body, iterations):
+    print(f"\n{name}: {len(body):,} bytes of JSON")
+    print(f"{'format':>14} {'bytes':>10} {'ratio':>7} {'cpu ms':>8} {'cached ms':>10}")
+    for label, as_msgpack, encoding in FORMATS:
+        if (as_msgpack and msgpack is None) or (encoding == "br" and brotli is None):
+            print(f"{label:>14} {'(not installed)':>28}")
+            continue
+        encoded = compact_body(body, as_msgpack, encoding)
+        cpu = time_ms(lambda: compact_body(body, as_msgpack, encoding), iterations)
+        # A cache hit costs hashing the freshly rendered JSON body
+        cached = time_ms(lambda: hashlib.sha1(body).digest(), iterations)
+        print(f"{label:>14} {len(encoded):>10,} {len(encoded) / len(body):>7.2f} {cpu:>8.2f} {cached:>10.3f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--products", type=int, default=1000)
+    parser.add_argument("--orders", type=int, default=200)
+    parser.add_argument("--iterations", type=int, default=20)
+    opts = parser.parse_args()
+
+    report(f"/api/products ({opts.products} products)", products_body(opts.products), opts.iterations)
+    report(f"/api/orders ({opts.orders} orders)", orders_body(opts.orders), opts.iterations)
+
+
+if __name__ == "__main__":
+    main()
@@ -18,6 +18,7 @@ const App = () => {
   const [token, setToken] = useState(localStorage.getItem('token'));
   const [currentView, setCurrentView] = useState('landing');
   const [loading, setLoading] = useState(false);
+  const [bootstrap, setBootstrap] = useState(null);
 
   // Set up axios interceptor for authentication
   useEffect(() => {
@@ -29,9 +30,11 @@ const App = () => {
 
   const fetchUserInfo = async () => {
     try {
-      const response = await axios.get('/me');
-      setUser(response.data);
-      setCurrentView(response.data.user_type === 'vendor' ? 'vendor-dashboard' : 'supplier-dashboard');
+      // One request for the user and the dashboard's first page of data
+      const response = await axios.get('/bootstrap');
+      setBootstrap(response.data);
+      setUser(response.data.user);
+      setCurrentView(response.data.user.user_type === 'vendor' ? 'vendor-dashboard' : 'supplier-dashboard');
     } catch (error) {
       console.error('Failed to fetch user info:', error);
       logout();
@@ -41,6 +44,7 @@ const App = () => {
   const logout = () => {
     setToken(null);
     setUser(null);
+    setBootstrap(null);
     localStorage.removeItem('token');
     delete axios.defaults.headers.common['Authorization'];
     setCurrentView('landing');
@@ -283,10 +287,19 @@ const App = () => {
     const [selectedSupplier, setSelectedSupplier] = useState(null);
 
     useEffect(() => {
-      fetchProducts();
-      fetchOrders();
-      fetchSuppliers();
-      fetchCategories();
+      if (bootstrap) {
+        setProducts(bootstrap.products);
+        setOrders(bootstrap.orders);
+        setSuppliers(bootstrap.suppliers);
+        setCategories(bootstrap.categories);
+        if (bootstrap.more_products) fetchProducts();
+        if (bootstrap.more_orders) fetchOrders();
+      } else {
+        fetchProducts();
+        fetchOrders();
+        fetchSuppliers();
+        fetchCategories();
+      }
       fetchAnalytics();
     }, []);
 
@@ -863,14 +876,21 @@ const App = () => {
     });
 
     useEffect(() => {
-      fetchProducts();
-      fetchOrders();
+      if (bootstrap) {
+        setProducts(bootstrap.products);
+        setOrders(bootstrap.orders);
+        if (bootstrap.more_products) fetchProducts();
+        if (bootstrap.more_orders) fetchOrders();
+      } else {
+        fetchProducts();
+        fetchOrders();
+      }
       fetchAnalytics();
     }, []);
 
     const fetchProducts = async () => {
       try {
-        const response = await axios.get('/products');
+        const response = await axios.get('/products', { params: { supplier_id: user.id } });
         setProducts(response.data);
       } catch (error) {
         console.error('Failed to fetch products:', error);
@@ -3,9 +3,13 @@
 import requests
 import sys
 import json
+import time
 from datetime import datetime
 import uuid
 
+# Delta sync holds back changes younger than the server's SYNC_SAFETY_LAG_SECONDS (default 5)
+SYNC_SAFETY_LAG_SECONDS = 5
+
 class StreetFoodAPITester:
     def __init__(self, base_url="https://6f13e53e-79bf-4fa8-9a93-42a4efa24ada.preview.emergentagent.com"):
         self.base_url = base_url
@@ -16,6 +20,7 @@ class StreetFoodAPITester:
         self.supplier_user = None
         self.test_product_id = None
         self.test_order_id = None
+        self.test_order = None
         self.tests_run = 0
         self.tests_passed = 0
 
@@ -46,6 +51,8 @@ class StreetFoodAPITester:
                 response = requests.post(url, json=data, headers=headers)
             elif method == 'PUT':
                 response = requests.put(url, json=data, headers=headers)
+            elif method == 'PATCH':
+                response = requests.patch(url, json=data, headers=headers)
             elif method == 'DELETE':
                 response = requests.delete(url, headers=headers)
 
@@ -89,6 +96,7 @@ class StreetFoodAPITester:
             "phone": "9876543211",
             "address": "456 Supply Street, Delhi",
             "user_type": "supplier",
+            "location": {"type": "Point", "coordinates": [77.2090, 28.6139]},
             "password": "testpass123"
         }
 
@@ -190,14 +198,63 @@ class StreetFoodAPITester:
         
         return success
 
+    def test_bulk_update_products(self):
+        """Test bulk stock/price update with a per-item failure for an unknown product"""
+        if not self.supplier_token or not self.test_product_id:
+            self.log_test("Bulk Update Products", False, "No supplier token or product available")
+            return False
+
+        bulk = {"updates": [
+            {"product_id": self.test_product_id, "stock_quantity": 250, "price": 47.5},
+            {"product_id": str(uuid.uuid4()), "stock_quantity": 1},
+        ]}
+        status, response = self.make_request('PATCH', 'products', bulk, self.supplier_token)
+        success = status == 200 and response['matched'] == 1 and response['modified'] == 1 \
+            and [failure['error'] for failure in response['failures']] == ["Product not found"]
+        
+        if success:
+            self.log_test("Bulk Update Products", True, f"Matched {response['matched']}, modified {response['modified']}")
+        else:
+            self.log_test("Bulk Update Products", False, f"Status: {status}, Response: {response}")
+        
+        return success
+
+    def test_product_price_history(self):
+        """Test the downsampled price and stock history of a product"""
+        if not self.vendor_token or not self.test_product_id:
+            self.log_test("Product Price History", False, "No vendor token or product available")
+            return False
+
+        status, response = self.make_request('GET', f'products/history?product_ids={self.test_product_id}&interval=hour',
+                                             token=self.vendor_token)
+        success = status == 200 and len(response) == 1 and response[0]['product_id'] == self.test_product_id \
+            and len(response[0]['points']) >= 1
+        if success:
+            # A start with a UTC offset is compared against the naive default end
+            start = datetime.utcnow().strftime('%Y-%m-%dT00:00:00Z')
+            status, _ = self.make_request('GET', f'products/history?product_ids={self.test_product_id}&interval=hour'
+                                                 f'&start={start}', token=self.vendor_token)
+            success = status == 200
+        
+        if success:
+            latest = response[0]['points'][-1]
+            self.log_test("Product Price History", True,
+                          f"{len(response[0]['points'])} periods, latest close ₹{latest['price_close']}")
+        else:
+            self.log_test("Product Price History", False, f"Status: {status}, Response: {response}")
+        
+        return success
+
     def test_get_products_supplier(self):
         """Test getting products as supplier (own products)"""
-        if not self.supplier_token:
+        if not self.supplier_token or not self.supplier_user:
             self.log_test("Get Products (Supplier)", False, "No supplier token available")
             return False
 
-        status, response = self.make_request('GET', 'products', token=self.supplier_token)
-        success = status == 200 and isinstance(response, list)
+        status, response = self.make_request('GET', f"products?supplier_id={self.supplier_user['id']}",
+                                             token=self.supplier_token)
+        success = (status == 200 and isinstance(response, list)
+                   and all(product['supplier_id'] == self.supplier_user['id'] for product in response))
         
         if success:
             self.log_test("Get Products (Supplier)", True, f"Found {len(response)} products")
@@ -222,6 +279,96 @@ class StreetFoodAPITester:
         
         return success
 
+    def test_product_delta_sync(self):
+        """Test catalog delta sync picks up a soft-deleted product"""
+        if not self.supplier_token:
+            self.log_test("Product Delta Sync", False, "No supplier token available")
+            return False
+
+        status, full = self.make_request('GET', 'products/changes?limit=1000')
+        if status != 200 or 'token' not in full:
+            self.log_test("Product Delta Sync", False, f"Status: {status}, Response: {full}")
+            return False
+        token = full['token']
+        while full['has_more']:
+            status, full = self.make_request('GET', f"products/changes?since={token}&limit=1000")
+            token = full['token']
+
+        product_data = {
+            "name": "Delta Sync Product",
+            "description": "Created and deleted by the sync test",
+            "price": 10.0,
+            "unit": "kg",
+            "category": "Test",
+            "min_order_quantity": 1,
+            "stock_quantity": 10
+        }
+        status, product = self.make_request('POST', 'products', product_data, self.supplier_token)
+        if status != 200:
+            self.log_test("Product Delta Sync", False, f"Product creation failed: {status}")
+            return False
+        status, _ = self.make_request('DELETE', f"products/{product['id']}", token=self.supplier_token)
+
+        time.sleep(SYNC_SAFETY_LAG_SECONDS + 1)
+        status, delta = self.make_request('GET', f"products/changes?since={token}")
+        success = status == 200 and product['id'] in delta['deleted']
+        
+        if success:
+            self.log_test("Product Delta Sync", True, f"{len(delta['changes'])} changed, {len(delta['deleted'])} deleted")
+        else:
+            self.log_test("Product Delta Sync", False, f"Status: {status}, Response: {delta}")
+        
+        return success
+
+    def test_bootstrap(self):
+        """Test the role-specific dashboard bootstrap payloads"""
+        if not self.vendor_token or not self.supplier_token:
+            self.log_test("Dashboard Bootstrap", False, "No vendor or supplier token available")
+            return False
+
+        status, vendor = self.make_request('GET', 'bootstrap', token=self.vendor_token)
+        vendor_ok = status == 200 and vendor['user']['user_type'] == 'vendor' \
+            and all(key in vendor for key in ('categories', 'suppliers', 'products', 'orders'))
+        status, supplier = self.make_request('GET', 'bootstrap', token=self.supplier_token)
+        supplier_ok = status == 200 and supplier['user']['user_type'] == 'supplier' and 'suppliers' not in supplier \
+            and all(product['supplier_id'] == supplier['user']['id'] for product in supplier['products'])
+        success = vendor_ok and supplier_ok
+        
+        if success:
+            self.log_test("Dashboard Bootstrap", True,
+                          f"Vendor: {len(vendor['products'])} products, supplier: {len(supplier['products'])} own products")
+        else:
+            self.log_test("Dashboard Bootstrap", False, f"Status: {status}, Vendor ok: {vendor_ok}, Supplier ok: {supplier_ok}")
+        
+        return success
+
+    def test_get_products_compressed(self):
+        """Test that large product listings are compressed when the client accepts gzip"""
+        if not self.vendor_token:
+            self.log_test("Get Products (Compressed)", False, "No vendor token available")
+            return False
+
+        headers = {'Authorization': f'Bearer {self.vendor_token}', 'Accept-Encoding': 'gzip'}
+        try:
+            response = requests.get(f"{self.api_url}/products", headers=headers)
+            products = response.json()
+        except Exception as e:
+            self.log_test("Get Products (Compressed)", False, str(e))
+            return False
+        # requests decodes gzip transparently; small catalogs are legitimately sent uncompressed
+        compressed = response.headers.get('Content-Encoding') == 'gzip'
+        success = response.status_code == 200 and isinstance(products, list) \
+            and (compressed or len(response.content) < 1024)
+        
+        if success:
+            encoding = 'gzip' if compressed else 'uncompressed (below threshold)'
+            self.log_test("Get Products (Compressed)", True, f"{len(products)} products, {encoding}")
+        else:
+            self.log_test("Get Products (Compressed)", False,
+                          f"Status: {response.status_code}, Content-Encoding: {response.headers.get('Content-Encoding')}")
+        
+        return success
+
     def test_get_suppliers(self):
         """Test getting suppliers list as vendor"""
         if not self.vendor_token:
@@ -238,6 +385,23 @@ class StreetFoodAPITester:
         
         return success
 
+    def test_get_nearby_suppliers(self):
+        """Test geo lookup of suppliers near the test supplier's location"""
+        if not self.supplier_user:
+            self.log_test("Get Nearby Suppliers", False, "No supplier user available")
+            return False
+
+        status, response = self.make_request('GET', 'suppliers/nearby?lng=77.2100&lat=28.6100&radius_km=5')
+        success = status == 200 and isinstance(response, list) \
+            and any(s['id'] == self.supplier_user['id'] for s in response)
+        
+        if success:
+            self.log_test("Get Nearby Suppliers", True, f"Found {len(response)} suppliers within 5 km")
+        else:
+            self.log_test("Get Nearby Suppliers", False, f"Status: {status}, Response: {response}")
+        
+        return success
+
     def test_create_order(self):
         """Test order creation by vendor"""
         if not self.vendor_token or not self.supplier_user or not self.test_product_id:
@@ -264,12 +428,91 @@ class StreetFoodAPITester:
         
         if success:
             self.test_order_id = response['id']
+            self.test_order = response
             self.log_test("Create Order", True, f"Created order: {response['id'][:8]}")
         else:
             self.log_test("Create Order", False, f"Status: {status}, Response: {response}")
         
         return success
 
+    def test_create_order_rejects_bad_lines(self):
+        """Test that non-positive quantities and unknown products never touch stock"""
+        if not self.vendor_token or not self.supplier_user or not self.test_product_id:
+            self.log_test("Reject Bad Order Lines", False, "Missing required data for order creation")
+            return False
+
+        def order_with(product_id, quantity):
+            return {
+                "supplier_id": self.supplier_user['id'],
+                "items": [{"product_id": product_id, "product_name": "Fresh Tomatoes", "quantity": quantity,
+                           "price": 45.50, "unit": "kg", "total": 45.50 * quantity}],
+                "delivery_address": "123 Street Food Lane, Mumbai"
+            }
+
+        negative, _ = self.make_request('POST', 'orders', order_with(self.test_product_id, -500), self.vendor_token)
+        unknown, _ = self.make_request('POST', 'orders', order_with(str(uuid.uuid4()), 1), self.vendor_token)
+        success = negative == 422 and unknown == 404
+        self.log_test("Reject Bad Order Lines", success, f"Negative quantity: {negative}, unknown product: {unknown}")
+        return success
+
+    def test_checkout_cart(self):
+        """Test multi-supplier cart checkout by vendor"""
+        if not self.vendor_token or not self.supplier_user or not self.test_product_id:
+            self.log_test("Checkout Cart", False, "Missing required data for checkout")
+            return False
+
+        cart_item = {
+            "supplier_id": self.supplier_user['id'],
+            "product_id": self.test_product_id,
+            "product_name": "Fresh Tomatoes",
+            "quantity": 5,
+            "price": 45.50,
+            "unit": "kg",
+            "total": 227.5
+        }
+        cart_data = {
+            "items": [cart_item, dict(cart_item, quantity=10, total=455.0)],
+            "delivery_address": "123 Street Food Lane, Mumbai"
+        }
+
+        status, response = self.make_request('POST', 'orders/checkout', cart_data, self.vendor_token)
+        success = status == 200 and isinstance(response, list) and len(response) == 1 \
+            and len(response[0]['items']) == 2
+        
+        if success:
+            self.log_test("Checkout Cart", True, f"Created {len(response)} order(s) from cart")
+        else:
+            self.log_test("Checkout Cart", False, f"Status: {status}, Response: {response}")
+        
+        return success
+
+    def test_update_order_status(self):
+        """Test supplier confirming an order and a stale update being rejected"""
+        if not self.supplier_token or not self.test_order:
+            self.log_test("Update Order Status", False, "No supplier token or order available")
+            return False
+
+        update = {"status": "confirmed", "expected_updated_at": self.test_order['updated_at']}
+        status, response = self.make_request('PATCH', f'orders/{self.test_order_id}/status', update,
+                                             self.supplier_token)
+        success = status == 200 and response['status'] == 'confirmed'
+        if not success:
+            self.log_test("Update Order Status", False, f"Status: {status}, Response: {response}")
+            return False
+
+        # Same expected_updated_at again: the order has moved on, so this must conflict
+        stale = {"status": "delivered", "expected_updated_at": self.test_order['updated_at']}
+        status, response = self.make_request('PATCH', f'orders/{self.test_order_id}/status', stale,
+                                             self.supplier_token)
+        success = status == 409
+        
+        if success:
+            self.log_test("Update Order Status", True, "Order confirmed, stale update rejected with 409")
+        else:
+            self.log_test("Update Order Status", False, f"Expected 409 for stale update, got {status}")
+        
+        return success
+
     def test_get_orders_vendor(self):
         """Test getting orders as vendor"""
         if not self.vendor_token:
@@ -277,15 +520,75 @@ class StreetFoodAPITester:
             return False
 
         status, response = self.make_request('GET', 'orders', token=self.vendor_token)
-        success = status == 200 and isinstance(response, list)
+        success = status == 200 and isinstance(response, list) \
+            and all(order.get('counterparty') for order in response)
         
         if success:
-            self.log_test("Get Orders (Vendor)", True, f"Found {len(response)} orders")
+            self.log_test("Get Orders (Vendor)", True, f"Found {len(response)} orders with supplier details")
         else:
             self.log_test("Get Orders (Vendor)", False, f"Status: {status}, Response: {response}")
         
         return success
 
+    def test_get_orders_not_modified(self):
+        """Test that polling orders with the last ETag returns 304"""
+        if not self.vendor_token:
+            self.log_test("Get Orders (Conditional)", False, "No vendor token available")
+            return False
+
+        headers = {'Authorization': f'Bearer {self.vendor_token}'}
+        try:
+            first = requests.get(f"{self.api_url}/orders", headers=headers)
+            etag = first.headers.get('ETag')
+            second = requests.get(f"{self.api_url}/orders", headers={**headers, 'If-None-Match': etag or ''})
+        except Exception as e:
+            self.log_test("Get Orders (Conditional)", False, str(e))
+            return False
+        success = first.status_code == 200 and bool(etag) and second.status_code == 304 and not second.content
+        
+        if success:
+            self.log_test("Get Orders (Conditional)", True, f"ETag {etag} answered with 304")
+        else:
+            self.log_test("Get Orders (Conditional)", False,
+                          f"Statuses: {first.status_code}/{second.status_code}, ETag: {etag}")
+        
+        return success
+
+    def test_get_orders_filtered(self):
+        """Test filtering orders and following the next-page cursor"""
+        if not self.supplier_token:
+            self.log_test("Get Orders (Filtered)", False, "No supplier token available")
+            return False
+
+        headers = {'Authorization': f'Bearer {self.supplier_token}'}
+        params = {'status': 'pending,confirmed', 'sort': 'newest', 'limit': 1}
+        seen = []
+        try:
+            for _ in range(5):
+                response = requests.get(f"{self.api_url}/orders", headers=headers, params=params)
+                if response.status_code != 200:
+                    break
+                seen += response.json()
+                if not response.headers.get('X-Next-Cursor'):
+                    break
+                params['cursor'] = response.headers['X-Next-Cursor']
+            bad_status = requests.get(f"{self.api_url}/orders", headers=headers, params={'status': 'shipped'})
+        except Exception as e:
+            self.log_test("Get Orders (Filtered)", False, str(e))
+            return False
+        dates = [order['created_at'] for order in seen]
+        success = response.status_code == 200 and bad_status.status_code == 400 and \
+            all(order['status'] in ('pending', 'confirmed') for order in seen) and \
+            dates == sorted(dates, reverse=True) and len({order['id'] for order in seen}) == len(seen)
+        
+        if success:
+            self.log_test("Get Orders (Filtered)", True, f"{len(seen)} open orders, one per page, newest first")
+        else:
+            self.log_test("Get Orders (Filtered)", False,
+                          f"Status: {response.status_code}/{bad_status.status_code}, Orders: {seen}")
+        
+        return success
+
     def test_get_orders_supplier(self):
         """Test getting orders as supplier"""
         if not self.supplier_token:
@@ -302,6 +605,31 @@ class StreetFoodAPITester:
         
         return success
 
+    def test_frequent_items_and_reorder(self):
+        """Test listing a vendor's frequently ordered items and reordering a past order"""
+        if not self.vendor_token or not self.test_order_id:
+            self.log_test("Frequent Items & Reorder", False, "No vendor token or order available")
+            return False
+
+        status, response = self.make_request('GET', 'orders/frequent-items', token=self.vendor_token)
+        success = status == 200 and any(
+            item['product_id'] == self.test_product_id for group in response for item in group['items']
+        )
+        if not success:
+            self.log_test("Frequent Items & Reorder", False, f"Status: {status}, Response: {response}")
+            return False
+
+        status, response = self.make_request('POST', f'orders/{self.test_order_id}/reorder',
+                                             token=self.vendor_token)
+        success = status == 200 and response['id'] != self.test_order_id and response['status'] == 'pending'
+        
+        if success:
+            self.log_test("Frequent Items & Reorder", True, f"Reordered as {response['id']}")
+        else:
+            self.log_test("Frequent Items & Reorder", False, f"Status: {status}, Response: {response}")
+        
+        return success
+
     def test_download_receipt_vendor(self):
         """Test PDF receipt download as vendor"""
         if not self.vendor_token or not self.test_order_id:
@@ -336,6 +664,61 @@ class StreetFoodAPITester:
         
         return success
 
+    def test_download_monthly_statement(self):
+        """Test streaming a supplier's monthly statement for a vendor"""
+        if not self.supplier_token or not self.vendor_user:
+            self.log_test("Download Monthly Statement", False, "No supplier token or vendor available")
+            return False
+
+        month = datetime.utcnow().strftime('%Y-%m')
+        status, response = self.make_request('GET', f"statements/{self.vendor_user['id']}?month={month}",
+                                             token=self.supplier_token, expect_json=False)
+        success = status == 200 and isinstance(response, bytes) and response.startswith(b'%PDF')
+        
+        if success:
+            self.log_test("Download Monthly Statement", True, f"PDF downloaded, size: {len(response)} bytes")
+        else:
+            self.log_test("Download Monthly Statement", False, f"Status: {status}, Response type: {type(response)}")
+        
+        return success
+
+    def test_demand_forecast(self):
+        """Test restock suggestions from the demand forecast"""
+        if not self.supplier_token:
+            self.log_test("Demand Forecast", False, "No supplier token available")
+            return False
+
+        status, response = self.make_request('GET', 'analytics/forecast?horizon_days=7', token=self.supplier_token)
+        success = status == 200 and response.get('horizon_days') == 7 and \
+            all(len(product['forecast']) == 7 and product['suggested_restock'] >= 0 for product in response['products'])
+        
+        if success:
+            restock = [product for product in response['products'] if product['suggested_restock'] > 0]
+            self.log_test("Demand Forecast", True,
+                          f"{len(response['products'])} products forecast, {len(restock)} need restocking")
+        else:
+            self.log_test("Demand Forecast", False, f"Status: {status}, Response: {response}")
+        
+        return success
+
+    def test_export_orders_csv(self):
+        """Test streaming the supplier's order lines as CSV"""
+        if not self.supplier_token:
+            self.log_test("Export Orders (CSV)", False, "No supplier token available")
+            return False
+
+        status, response = self.make_request('GET', 'exports/orders?format=csv', token=self.supplier_token,
+                                             expect_json=False)
+        lines = response.decode().splitlines() if isinstance(response, bytes) else []
+        success = status == 200 and lines and lines[0].startswith('order_id,created_at,status')
+        
+        if success:
+            self.log_test("Export Orders (CSV)", True, f"{len(lines) - 1} order lines exported")
+        else:
+            self.log_test("Export Orders (CSV)", False, f"Status: {status}, Response: {response!r:.200}")
+        
+        return success
+
     def test_get_categories(self):
         """Test getting all product categories"""
         if not self.vendor_token:
@@ -389,6 +772,20 @@ class StreetFoodAPITester:
         
         return success
 
+    def test_get_product_facets(self):
+        """Test facet counts for the catalog, narrowed by a category selection"""
+        status, response = self.make_request('GET', 'products/facets?category=Vegetables')
+        success = status == 200 and all(key in response for key in ['categories', 'units', 'price_bands', 'total']) \
+            and any(facet['value'] == 'Vegetables' for facet in response['categories'])
+        
+        if success:
+            self.log_test("Get Product Facets", True,
+                          f"{len(response['categories'])} categories, {response['total']} products in selection")
+        else:
+            self.log_test("Get Product Facets", False, f"Status: {status}, Response: {response}")
+        
+        return success
+
     def test_seed_sample_data(self):
         """Test sample data seeding functionality"""
         if not self.supplier_token:
@@ -405,6 +802,32 @@ class StreetFoodAPITester:
         
         return success
 
+    def test_seed_sample_data_background(self):
+        """Test seeding as a background job and polling it to completion"""
+        if not self.supplier_token:
+            self.log_test("Seed Sample Data (Background Job)", False, "No supplier token available")
+            return False
+
+        status, response = self.make_request('POST', 'seed-data?background=true', token=self.supplier_token)
+        if status != 202 or 'job_id' not in response:
+            self.log_test("Seed Sample Data (Background Job)", False, f"Status: {status}, Response: {response}")
+            return False
+
+        job_id = response['job_id']
+        for _ in range(30):
+            status, job = self.make_request('GET', f'jobs/{job_id}', token=self.supplier_token)
+            if status != 200 or job['status'] in ('succeeded', 'failed'):
+                break
+            time.sleep(1)
+        success = status == 200 and job['status'] == 'succeeded' and job['progress'] == 1.0
+        
+        if success:
+            self.log_test("Seed Sample Data (Background Job)", True, f"Job {job_id} result: {job['result']}")
+        else:
+            self.log_test("Seed Sample Data (Background Job)", False, f"Status: {status}, Job: {job}")
+        
+        return success
+
     def test_vendor_analytics(self):
         """Test vendor analytics endpoint"""
         if not self.vendor_token:
@@ -443,6 +866,27 @@ class StreetFoodAPITester:
         
         return success
 
+    def test_request_deadline_shedding(self):
+        """Test that a request whose client deadline is too short is shed with 503"""
+        if not self.vendor_token:
+            self.log_test("Request Deadline Shedding", False, "No vendor token available")
+            return False
+
+        headers = {'Authorization': f'Bearer {self.vendor_token}', 'X-Request-Timeout-Ms': '1'}
+        try:
+            response = requests.get(f"{self.api_url}/analytics/vendor", headers=headers)
+        except Exception as e:
+            self.log_test("Request Deadline Shedding", False, str(e))
+            return False
+        success = response.status_code == 503 and 'Retry-After' in response.headers
+        
+        if success:
+            self.log_test("Request Deadline Shedding", True, response.json()['detail'])
+        else:
+            self.log_test("Request Deadline Shedding", False, f"Status: {response.status_code}")
+        
+        return success
+
     def test_unauthorized_access(self):
         """Test unauthorized access scenarios"""
         # Test accessing protected endpoint without token
@@ -499,6 +943,7 @@ class StreetFoodAPITester:
         print("\n🌱 Sample Data Seeding Tests")
         print("-" * 30)
         self.test_seed_sample_data()
+        self.test_seed_sample_data_background()
 
         # NEW FEATURES: Category Management Tests
         print("\n📂 Category Management Tests")
@@ -506,38 +951,55 @@ class StreetFoodAPITester:
         self.test_get_categories()
         self.test_get_products_by_category()
         self.test_get_products_with_category_filter()
+        self.test_get_product_facets()
 
         # Product Management Tests
         print("\n📦 Product Management Tests")
         print("-" * 30)
         self.test_create_product()
         self.test_get_products_supplier()
+        self.test_bulk_update_products()
+        self.test_product_price_history()
         self.test_get_products_vendor()
+        self.test_get_products_compressed()
+        self.test_bootstrap()
+        self.test_product_delta_sync()
         self.test_get_suppliers()
+        self.test_get_nearby_suppliers()
 
         # Order Management Tests
         print("\n🛒 Order Management Tests")
         print("-" * 30)
         self.test_create_order()
+        self.test_create_order_rejects_bad_lines()
+        self.test_checkout_cart()
+        self.test_update_order_status()
         self.test_get_orders_vendor()
+        self.test_get_orders_not_modified()
         self.test_get_orders_supplier()
+        self.test_get_orders_filtered()
+        self.test_frequent_items_and_reorder()
 
         # NEW FEATURES: Analytics Tests
         print("\n📊 Analytics Tests")
         print("-" * 30)
         self.test_vendor_analytics()
         self.test_supplier_analytics()
+        self.test_demand_forecast()
+        self.test_export_orders_csv()
 
         # Receipt Generation Tests
         print("\n🧾 Receipt Generation Tests")
         print("-" * 30)
         self.test_download_receipt_vendor()
         self.test_download_receipt_supplier()
+        self.test_download_monthly_statement()
 
         # Security Tests
         print("\n🔒 Security Tests")
         print("-" * 30)
         self.test_unauthorized_access()
+        self.test_request_deadline_shedding()
 
         # Final Results
         print("\n" + "=" * 50)
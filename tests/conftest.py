@@ -0,0 +1,58 @@
+"""Shared fixtures for the tests that import backend/server.py against a real MongoDB.
+
+server.py reads its configuration from the environment at import, so each test module gets a
+freshly imported copy, and the environment, sys.path and sys.modules are restored once the
+module's tests are done. Settings from one module can't leak into the next.
+"""
+import asyncio
+import os
+import sys
+from pathlib import Path
+
+import pytest
+
+BACKEND_DIR = str(Path(__file__).resolve().parent.parent / "backend")
+
+
+@pytest.fixture(scope="module")
+def load_server():
+    """Return a function that imports server.py with the given environment variables set.
+
+    It returns the module and an event loop to drive it with. The client and the loop are
+    closed at the end of the test module.
+    """
+    loaded = []
+    with pytest.MonkeyPatch.context() as mp:
+        def load(**env):
+            for name, value in env.items():
+                mp.setenv(name, value)
+            mp.syspath_prepend(BACKEND_DIR)
+            mp.delitem(sys.modules, "server", raising=False)
+            import server
+
+            loop = asyncio.new_event_loop()
+            loaded.append((server, loop))
+            return server, loop
+
+        yield load
+        for server, loop in loaded:
+            server.client.close()
+            loop.close()
+        sys.modules.pop("server", None)
+
+
+@pytest.fixture(scope="module")
+def mongo_client():
+    """A pymongo client for TEST_MONGO_URL; the module is skipped when no server answers there."""
+    from pymongo import MongoClient
+    from pymongo.errors import ServerSelectionTimeoutError
+
+    url = os.environ["TEST_MONGO_URL"]
+    sync_client = MongoClient(url, serverSelectionTimeoutMS=2000)
+    try:
+        sync_client.admin.command("ping")
+    except ServerSelectionTimeoutError:
+        sync_client.close()
+        pytest.skip(f"no mongod reachable at {url}")
+    yield sync_client
+    sync_client.close()
@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""Cache invalidation bus checks against a local mongod.
+
+Another worker is played by a separate pymongo client writing to cache_invalidations,
+and the server's listener has to evict the matching cache entries. The propagation
+delay from write to eviction is measured and reported.
+
+    TEST_MONGO_URL="mongodb://localhost:27017" python -m pytest tests/test_invalidation_bus.py -s
+
+The tests are skipped when TEST_MONGO_URL is not set or the server is unreachable.
+"""
+import asyncio
+import os
+import statistics
+import time
+from datetime import datetime
+
+import pytest
+
+TEST_MONGO_URL = os.environ.get("TEST_MONGO_URL")
+TEST_DB_NAME = "invalidation_bus_test"
+
+# Worst delay tolerated between another worker's write and the eviction here
+MAX_PROPAGATION_SECONDS = 0.5
+SAMPLES = 20
+
+pytestmark = pytest.mark.skipif(not TEST_MONGO_URL, reason="TEST_MONGO_URL not set")
+
+
+@pytest.fixture(scope="module")
+def bus(mongo_client, load_server):
+    sync_client = mongo_client
+    # Resuming must rely on the saved position, not on replaying recent events
+    server, loop = load_server(MONGO_URL=TEST_MONGO_URL, DB_NAME=TEST_DB_NAME,
+                               INVALIDATION_RESUME_OVERLAP_SECONDS="0", INVALIDATION_RETRY_SECONDS="0.1")
+
+    sync_client.drop_database(TEST_DB_NAME)
+    loop.run_until_complete(server.create_invalidation_collection())
+
+    received = []
+    server.invalidation_handler("probe")(lambda probe_id: received.append((probe_id, time.perf_counter())))
+
+    yield server, sync_client[TEST_DB_NAME], loop, received
+    sync_client.drop_database(TEST_DB_NAME)
+
+
+def other_worker_publishes(db, entity, entity_id):
+    db.cache_invalidations.insert_one({"entity": entity, "id": entity_id, "version": None,
+                                       "published_at": datetime.utcnow()})
+
+
+async def wait_for(condition, timeout=5):
+    deadline = time.perf_counter() + timeout
+    while not condition():
+        assert time.perf_counter() < deadline, "timed out"
+        await asyncio.sleep(0.001)
+
+
+async def start_listener(server):
+    listener = asyncio.create_task(server.run_invalidation_listener())
+    await wait_for(lambda: server._invalidations_live)
+    return listener
+
+
+async def stop_listener(listener):
+    listener.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await listener
+
+
+def test_propagation_delay(bus):
+    server, db, loop, received = bus
+
+    async def measure():
+        listener = await start_listener(server)
+        delays = []
+        try:
+            for sample in range(SAMPLES):
+                probe_id = f"delay-{sample}"
+                # The insert runs in a thread so the listener keeps running on this loop
+                written = time.perf_counter()
+                await asyncio.to_thread(other_worker_publishes, db, "probe", probe_id)
+                await wait_for(lambda: any(got == probe_id for got, _ in received))
+                delays.append(next(at for got, at in received if got == probe_id) - written)
+        finally:
+            await stop_listener(listener)
+        return delays
+
+    delays = loop.run_until_complete(measure())
+    print(f"\npropagation delay over {SAMPLES} events: median {statistics.median(delays) * 1000:.1f} ms, "
+          f"max {max(delays) * 1000:.1f} ms")
+    assert max(delays) < MAX_PROPAGATION_SECONDS
+
+
+def test_resumes_from_last_position(bus):
+    server, db, loop, received = bus
+
+    async def run():
+        listener = await start_listener(server)
+        await stop_listener(listener)
+        # Written while this worker is disconnected, then picked up once it is back
+        await asyncio.to_thread(other_worker_publishes, db, "probe", "while-away")
+        listener = await start_listener(server)
+        try:
+            await wait_for(lambda: any(got == "while-away" for got, _ in received))
+        finally:
+            await stop_listener(listener)
+
+    loop.run_until_complete(run())
+
+
+def test_other_workers_catalog_write_evicts_facets(bus):
+    server, db, loop, received = bus
+    db.products.insert_one({**server.SAMPLE_PRODUCTS[0], "id": "p1", "supplier_id": "s1", "is_active": True,
+                            "created_at": datetime.utcnow(), "updated_at": datetime.utcnow()})
+
+    async def run():
+        listener = await start_listener(server)
+        try:
+            await server.get_product_facets()
+            assert server._facet_cache
+            await asyncio.to_thread(other_worker_publishes, db, "facets", None)
+            await wait_for(lambda: not server._facet_cache)
+        finally:
+            await stop_listener(listener)
+
+    loop.run_until_complete(run())
@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+"""Query-plan regression tests for the query shapes used by server.py.
+
+Seeds a throwaway database on a local mongod with the synthetic data generator,
+creates the server's indexes, and runs explain() on every hot query. A test fails
+when a winning plan contains a COLLSCAN or examines far more documents than it
+returns.
+
+    TEST_MONGO_URL="mongodb://localhost:27017" python -m pytest tests/test_query_plans.py
+
+The tests are skipped when TEST_MONGO_URL is not set or the server is unreachable.
+"""
+import os
+from datetime import datetime, timedelta
+
+import pytest
+
+TEST_MONGO_URL = os.environ.get("TEST_MONGO_URL")
+TEST_DB_NAME = "query_plan_test"
+
+SUPPLIERS, VENDORS, PRODUCTS, ORDERS, DAYS, SEED = 20, 60, 800, 4000, 120, 7
+
+# A plan may examine this many times the documents it returns, plus some slack
+# for small result sets, before it counts as a regression
+MAX_EXAMINED_RATIO = 2
+EXAMINED_SLACK = 20
+
+pytestmark = pytest.mark.skipif(not TEST_MONGO_URL, reason="TEST_MONGO_URL not set")
+
+
+@pytest.fixture(scope="module")
+def seeded(mongo_client, load_server):
+    sync_client = mongo_client
+    server, loop = load_server(MONGO_URL=TEST_MONGO_URL, DB_NAME=TEST_DB_NAME)
+    import generate_data
+
+    sync_client.drop_database(TEST_DB_NAME)
+    epoch = datetime(2025, 1, 1)
+    loop.run_until_complete(generate_data.generate_dataset(
+        TEST_MONGO_URL, TEST_DB_NAME, SUPPLIERS, VENDORS, PRODUCTS, ORDERS, DAYS, SEED,
+        batch_size=500, concurrency=4, password="password123", drop=True, epoch=epoch,
+    ))
+    loop.run_until_complete(server.create_indexes())
+
+    db = sync_client[TEST_DB_NAME]
+    yield server, db, epoch
+    sync_client.drop_database(TEST_DB_NAME)
+
+
+def explain(db, command):
+    return db.command({"explain": command, "verbosity": "executionStats"})
+
+
+def find_all(node, key):
+    """Every value stored under `key` anywhere in a nested explain document."""
+    if isinstance(node, dict):
+        for k, v in node.items():
+            if k == key:
+                yield v
+            yield from find_all(v, key)
+    elif isinstance(node, list):
+        for v in node:
+            yield from find_all(v, key)
+
+
+def assert_efficient(name, result):
+    stages = [stage for plan in find_all(result, "winningPlan") for stage in find_all(plan, "stage")]
+    assert stages, f"{name}: no winning plan in explain output"
+    assert "COLLSCAN" not in stages, f"{name}: winning plan uses a collection scan: {stages}"
+    # $lookup stages report their own scans of the joined collection
+    assert not any(find_all(result, "collectionScans")), f"{name}: $lookup scans the joined collection"
+
+    for stats in find_all(result, "executionStats"):
+        returned = stats.get("nReturned", 0)
+        examined = stats.get("totalDocsExamined", 0)
+        assert examined <= returned * MAX_EXAMINED_RATIO + EXAMINED_SLACK, \
+            f"{name}: examined {examined} documents to return {returned}"
+
+
+def query_shapes(server, db, epoch):
+    """The queries server.py issues on its hot paths, with realistic parameter values."""
+    user = db.users.find_one({"user_type": "vendor"})
+    supplier = db.users.find_one({"user_type": "supplier"})
+    order = db.orders.find_one({})
+    thirty_days_ago = epoch - timedelta(days=30)
+    three_days_ago = epoch - timedelta(days=3)
+    category = "Vegetables"
+
+    def listing(field, value, counterparty, statuses=(), start=None, counterparty_id=None, sort="newest",
+                cursor=None, limit=1000):
+        query, order_sort = server.order_listing_query({field: value}, counterparty, list(statuses), start, None,
+                                                       counterparty_id, None, sort, cursor)
+        return {
+            "aggregate": "orders",
+            "pipeline": server.orders_with_counterparty_pipeline(query, counterparty, limit + 1, sort=order_sort),
+            "cursor": {},
+        }
+
+    second_page = server.encode_order_cursor("newest", db.orders.find_one(
+        {"supplier_id": supplier["id"]}, sort=[("created_at", -1), ("id", -1)], skip=50))
+    return {
+        "user by email": {"find": "users", "filter": {"email": user["email"]}, "limit": 1},
+        "user by id": {"find": "users", "filter": {"id": user["id"]}, "limit": 1},
+        "product by id": {"find": "products", "filter": {"id": order["items"][0]["product_id"]}, "limit": 1},
+        "active products": {"find": "products", "filter": {"is_active": True}, "limit": 1000},
+        "active products by category": {"find": "products", "filter": {"category": category, "is_active": True},
+                                        "limit": 1000},
+        "supplier's active products": {"find": "products", "filter": {"supplier_id": supplier["id"],
+                                                                      "is_active": True}, "limit": 1000},
+        "active categories": {"distinct": "products", "key": "category", "query": {"is_active": True}},
+        "suppliers in category": {"distinct": "products", "key": "supplier_id",
+                                  "query": {"category": category, "is_active": True}},
+        "supplier listing": {"find": "users", "filter": {"user_type": "supplier", "is_active": True},
+                             "limit": 1000},
+        "catalog changes": {"find": "products",
+                            "filter": {"updated_at": {"$lte": epoch}, "$or": [
+                                {"updated_at": {"$gt": three_days_ago}},
+                                {"updated_at": three_days_ago, "id": {"$gt": order["items"][0]["product_id"]}},
+                            ]},
+                            "sort": {"updated_at": 1, "id": 1}, "limit": 501},
+        "order by id": {"find": "orders", "filter": {"id": order["id"]}, "limit": 1},
+        "vendor orders": listing("vendor_id", order["vendor_id"], "supplier_id"),
+        "supplier orders": listing("supplier_id", supplier["id"], "vendor_id"),
+        "supplier pending orders today": listing("supplier_id", supplier["id"], "vendor_id", statuses=["pending"],
+                                                 start=epoch - timedelta(days=1), limit=50),
+        "supplier open orders": listing("supplier_id", supplier["id"], "vendor_id",
+                                        statuses=["pending", "confirmed"], limit=50),
+        "vendor orders from supplier": listing("vendor_id", order["vendor_id"], "supplier_id",
+                                               counterparty_id=order["supplier_id"], limit=50),
+        "supplier largest orders": listing("supplier_id", supplier["id"], "vendor_id", sort="total_desc", limit=50),
+        "supplier orders next page": listing("supplier_id", supplier["id"], "vendor_id", cursor=second_page, limit=50),
+        "vendor orders change token": {"find": "orders", "filter": {"vendor_id": order["vendor_id"]},
+                                       "projection": {"_id": 0, "updated_at": 1}, "sort": {"updated_at": -1},
+                                       "limit": 1},
+        "supplier orders count": {"count": "orders", "query": {"supplier_id": supplier["id"]}},
+        "vendor analytics range": {"find": "orders", "filter": {"vendor_id": order["vendor_id"],
+                                                                 "created_at": {"$gte": thirty_days_ago}}},
+        "supplier analytics range": {"find": "orders", "filter": {"supplier_id": supplier["id"],
+                                                                   "created_at": {"$gte": thirty_days_ago}}},
+    }
+
+
+def test_hot_queries_use_indexes(seeded):
+    server, db, epoch = seeded
+    failures = []
+    for name, command in query_shapes(server, db, epoch).items():
+        try:
+            assert_efficient(name, explain(db, command))
+        except AssertionError as exc:
+            failures.append(str(exc))
+    assert not failures, "\n".join(failures)
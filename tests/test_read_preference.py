@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""Read routing checks against a local three-member replica set.
+
+Start one with, for example:
+
+    mongod --replSet rs0 --port 27017 --dbpath /tmp/rs0-0 &
+    mongod --replSet rs0 --port 27018 --dbpath /tmp/rs0-1 &
+    mongod --replSet rs0 --port 27019 --dbpath /tmp/rs0-2 &
+    mongosh --port 27017 --eval 'rs.initiate({_id: "rs0", members: [
+        {_id: 0, host: "localhost:27017"}, {_id: 1, host: "localhost:27018"},
+        {_id: 2, host: "localhost:27019"}]})'
+
+and run:
+
+    REPLICA_SET_URL="mongodb://localhost:27017,localhost:27018,localhost:27019/?replicaSet=rs0" \
+        python -m pytest tests/test_read_preference.py
+
+The tests are skipped when REPLICA_SET_URL is not set.
+"""
+import asyncio
+import os
+
+import pytest
+
+REPLICA_SET_URL = os.environ.get("REPLICA_SET_URL")
+
+pytestmark = pytest.mark.skipif(not REPLICA_SET_URL, reason="REPLICA_SET_URL not set")
+
+
+@pytest.fixture(scope="module")
+def server(load_server):
+    server_module, loop = load_server(
+        MONGO_URL=REPLICA_SET_URL, DB_NAME="read_preference_test",
+        CATALOG_READ_PREFERENCE="secondaryPreferred", ANALYTICS_READ_PREFERENCE="secondaryPreferred",
+        READ_MAX_STALENESS_SECONDS="90",
+    )
+    loop.run_until_complete(server_module.db.products.insert_one({"probe": True}))
+    yield server_module, loop
+    loop.run_until_complete(server_module.client.drop_database("read_preference_test"))
+
+
+async def served_by(collection):
+    """Run a query and return the address of the member that answered it."""
+    cursor = collection.find({}).batch_size(1)
+    await cursor.to_list(1)
+    return cursor.address
+
+
+async def discovered_secondaries(client, timeout=10):
+    # Members are discovered in the background after the first connection
+    for _ in range(timeout * 10):
+        if client.secondaries:
+            return client.secondaries
+        await asyncio.sleep(0.1)
+    return set()
+
+
+def test_catalog_and_analytics_use_secondary_preferred_with_staleness(server):
+    server_module, _ = server
+    for database in (server_module.catalog_db, server_module.analytics_db):
+        assert database.read_preference.mongos_mode == "secondaryPreferred"
+        assert database.read_preference.max_staleness == 90
+
+
+def test_primary_database_stays_on_primary(server):
+    server_module, _ = server
+    assert server_module.db.read_preference.mongos_mode == "primary"
+
+
+def test_catalog_reads_are_served_by_a_secondary(server):
+    server_module, loop = server
+    secondaries = loop.run_until_complete(discovered_secondaries(server_module.client))
+    assert secondaries, "replica set has no readable secondaries"
+    address = loop.run_until_complete(served_by(server_module.catalog_db.products))
+    assert address in secondaries
+
+
+def test_order_reads_are_served_by_the_primary(server):
+    server_module, loop = server
+    address = loop.run_until_complete(served_by(server_module.db.orders))
+    assert address == server_module.client.primary